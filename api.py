@@ -0,0 +1,200 @@
+"""Read-only JSON API over the dashboard engine, as a plain WSGI application.
+
+Usage:
+    python api.py --port 8000                    # threaded development server
+    gunicorn -w 4 --threads 8 api:app            # production, one engine per worker process
+
+Endpoints (sectors are addressed by ISIC division code, e.g. 24):
+    GET /sectors
+    GET /sectors/<code>/summary?year=2023
+    GET /sectors/<code>/flows/<exports|imports>?year=2023&top=10
+    GET /sectors/<code>/flows/<exports|imports>/top?year=2023&n=15
+
+Every successful response carries an ETag derived from the data version and the
+request, so clients revalidate with If-None-Match and get 304 until the cleaned data
+changes. Error responses carry no ETag.
+"""
+import argparse
+import hashlib
+import json
+import sys
+import threading
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, unquote
+from wsgiref.simple_server import WSGIServer, make_server
+
+from datastore import data_version
+from engine import FLOW_TYPES, TOP_ITEMS, DashboardEngine
+
+COMMODITY_COLUMNS = ["COMMODTIY_CODE", "COMM_NAME_EN", "COMM_NAME_AR"]
+MAX_ITEMS = 500
+
+_STATUS = {
+    200: "200 OK",
+    304: "304 Not Modified",
+    400: "400 Bad Request",
+    404: "404 Not Found",
+    405: "405 Method Not Allowed",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class EngineHolder:
+    """Holds the engine for the current data version, rebuilding it when the cleaned data changes."""
+
+    def __init__(self, loader=DashboardEngine.load):
+        self._loader = loader
+        self._engine = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = data_version()
+        engine = self._engine
+        if engine is None or engine.version != version:
+            with self._lock:
+                if self._engine is None or self._engine.version != version:
+                    self._engine = self._loader()
+                engine = self._engine
+        return engine
+
+
+def _records(df, columns):
+    """Returns rows as JSON-ready dicts, with missing values as None."""
+    return json.loads(df[columns].to_json(orient="records", force_ascii=False))
+
+
+def _int_param(query, name, default, maximum=MAX_ITEMS):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+    if not 0 < value <= maximum:
+        raise HTTPError(400, f"{name} must be between 1 and {maximum}")
+    return value
+
+
+def _year_param(engine, query):
+    year = query.get("year", [engine.years[0]])[0]
+    if year not in engine.years:
+        raise HTTPError(400, f"year must be one of {', '.join(engine.years)}")
+    return year
+
+
+def _flow_param(flow):
+    flow_type = flow.capitalize()
+    if flow_type not in FLOW_TYPES:
+        raise HTTPError(404, f"unknown flow {flow!r}")
+    return flow_type
+
+
+def _sector_param(engine, code):
+    sector = engine.sector_for_code(code) if code.isdigit() else None
+    if sector is None:
+        raise HTTPError(404, f"unknown sector {code!r}")
+    return sector
+
+
+def list_sectors(engine, query):
+    sectors = engine.metrics.reset_index()[["isic_code", "sector", "sut_sector"]]
+    return {"years": engine.years, "sectors": _records(sectors, ["isic_code", "sector", "sut_sector"])}
+
+
+def sector_summary(engine, query, code):
+    return engine.sector_summary(_sector_param(engine, code), _year_param(engine, query))
+
+
+def flow_breakdown(engine, query, code, flow):
+    sector, flow_type, year = _sector_param(engine, code), _flow_param(flow), _year_param(engine, query)
+    breakdown = engine.flow_breakdown(sector, flow_type, year, _int_param(query, "top", TOP_ITEMS))
+    return {
+        "sector": sector,
+        "flow": flow_type,
+        "year": year,
+        "total": breakdown["total"],
+        "top": _records(breakdown["top"], COMMODITY_COLUMNS + [year]),
+        "other": {"total": breakdown["other_total"], "items": len(breakdown["other"])},
+    }
+
+
+def top_commodities(engine, query, code, flow):
+    sector, flow_type, year = _sector_param(engine, code), _flow_param(flow), _year_param(engine, query)
+    top = engine.top_commodities(sector, flow_type, year, _int_param(query, "n", 15))
+    columns = COMMODITY_COLUMNS + [year, "Growth", "Share", "Sector Share", "Rank"]
+    return {"sector": sector, "flow": flow_type, "year": year, "items": _records(top, columns)}
+
+
+def route(path):
+    """Returns the handler and path arguments for a request path, or raises HTTPError(404)."""
+    parts = [unquote(part) for part in path.strip("/").split("/") if part]
+    if parts == ["sectors"]:
+        return list_sectors, []
+    if len(parts) == 3 and parts[0] == "sectors" and parts[2] == "summary":
+        return sector_summary, [parts[1]]
+    if len(parts) == 4 and parts[0] == "sectors" and parts[2] == "flows":
+        return flow_breakdown, parts[1::2]
+    if len(parts) == 5 and parts[0] == "sectors" and parts[2] == "flows" and parts[4] == "top":
+        return top_commodities, [parts[1], parts[3]]
+    raise HTTPError(404, "not found")
+
+
+def make_app(holder=None):
+    """Returns the WSGI application; engines are shared by every thread of the process."""
+    holder = holder or EngineHolder()
+
+    def app(environ, start_response):
+        headers = [("Content-Type", "application/json; charset=utf-8"), ("Cache-Control", "no-cache")]
+        try:
+            if environ["REQUEST_METHOD"] not in ("GET", "HEAD"):
+                raise HTTPError(405, "only GET is supported")
+            handler, args = route(environ.get("PATH_INFO", "/"))
+            engine = holder.get()
+            query_string = environ.get("QUERY_STRING", "")
+            # Validates the request first: only a 200 carries an ETag, so an error never revalidates to 304.
+            body = handler(engine, parse_qs(query_string), *args)
+            status = 200
+            etag = '"{}-{}"'.format(
+                engine.version,
+                hashlib.sha1(f"{environ.get('PATH_INFO')}?{query_string}".encode()).hexdigest()[:12],
+            )
+            headers.append(("ETag", etag))
+            if etag in environ.get("HTTP_IF_NONE_MATCH", ""):
+                start_response(_STATUS[304], headers)
+                return [b""]
+        except HTTPError as error:
+            status, body = error.status, {"error": str(error)}
+        except KeyError as error:
+            status, body = 404, {"error": str(error.args[0]) if error.args else "not found"}
+
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        headers.append(("Content-Length", str(len(payload))))
+        start_response(_STATUS[status], headers)
+        return [b"" if environ["REQUEST_METHOD"] == "HEAD" else payload]
+
+    return app
+
+
+app = make_app()
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+    with make_server(args.host, args.port, app, server_class=ThreadingWSGIServer) as server:
+        print(f"serving on http://{args.host}:{args.port}")
+        server.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
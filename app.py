@@ -1,12 +1,56 @@
-import streamlit as st
+import functools
+import os
+import uuid
+
 import pandas as pd
-import plotly.express as px
-import numpy as np
-import plotly.graph_objects as go
+import streamlit as st
+
+from charts import (
+    create_all_sectors_sankey,
+    create_expanded_flow_sankey,
+    create_sector_matrix_chart,
+    flow_bar_chart,
+    flow_heatmap,
+    heatmap_page_count,
+    hs_flow_sankey,
+    sector_overview,
+)
+from commodity_table import default_columns, page_rows, query_rows, sortable_columns
+from datastore import data_version, read_cleaned_data
+from engine import SUMMARY_FIELDS, SUT_YEAR, DashboardEngine, split_top
+from figure_cache import FigureCache, deserialize_figure, figure_key, serialize_figure
+from formatting import format_amount, format_percent, format_value
+from hs_rollup import HS_LEVELS
+from instrumentation import NULL_TRACE, Tracer, current_trace
+from labels import COMMODITY_NAME, DEFAULT_LANGUAGE, LANGUAGES, SECTOR_NAME
+from publish import PUBLISH_DIR, published_figures
+from warm_cache import WarmCache
 
 VALID_USERNAME = st.secrets["credentials"]["username"]
 VALID_PASSWORD = st.secrets["credentials"]["password"]
 
+# Rows per page of the commodity tables; only the visible page is sent to the browser.
+TABLE_PAGE_ROWS = int(os.environ.get("TABLE_PAGE_ROWS", "100"))
+SEARCH_RESULTS = 10
+# Optional cap on the shared engine; past it, least recently used sector indexes are rebuilt on demand.
+DATA_MEMORY_BUDGET_MB = float(os.environ.get("DATA_MEMORY_BUDGET_MB", "0")) or None
+PRODUCT_TABS = {"Exports": "📤 Export Products", "Imports": "📥 Import Products"}
+BREAKDOWNS = ["Commodities", "HS codes"]
+# Display labels of the SUMMARY_FIELDS, in the same order.
+SUMMARY_LABELS = {
+    "sales": "Sales",
+    "exports": "Exports",
+    "imports": "Imports",
+    "consumer_sales": "Consumer Sales",
+    "b2b_sales": "B2B Sales (Raw Material)",
+    "capex_opex": "CAPEX/OPEX",
+}
+ALL_SECTORS_CHARTS = {"Sankey": create_all_sectors_sankey, "Stacked bars": create_sector_matrix_chart}
+
+# Opt-in per-rerun timing: DASHBOARD_PROFILE=1 or [profiling] enabled = true in secrets.
+PROFILING_SECRETS = st.secrets.get("profiling", {})
+PROFILING = os.environ.get("DASHBOARD_PROFILE", "").lower() in ("1", "true", "yes") or bool(PROFILING_SECRETS.get("enabled", False))
+
 st.set_page_config(page_title="Industrial economic data dashboard", page_icon="", layout="wide")
 
 st.markdown("""
@@ -169,19 +213,106 @@ def authenticate_user():
         if submitted:
             if username == VALID_USERNAME and password == VALID_PASSWORD:
                 st.session_state.authenticated = True
+                st.session_state.username = username
                 st.success("✅ Login successful")
                 st.rerun()
             else:
                 st.error("❌ Invalid username or password")
         st.stop()
 
-@st.cache_data(show_spinner="Loading data...")
-def load_data():
-    """Loads and caches CSV data for imports, exports, and supply-use tables."""
-    imports = pd.read_csv("cleaned_data/cleaned_imports.csv")
-    exports = pd.read_csv("cleaned_data/cleaned_exports.csv")
-    sut_io = pd.read_csv("cleaned_data/sut_io_cleaned_data.csv")
-    return imports, exports, sut_io
+@st.cache_resource(show_spinner="Loading data...")
+def load_engine(version):
+    """Builds and shares the query engine (data, sector metrics, trade years) once per data version.
+
+    Every session reads the same frozen frames; nothing is copied per session or rerun.
+    A restart restores the engine from the warm cache when one was saved for this data and code.
+    """
+    budget = DATA_MEMORY_BUDGET_MB * 2**20 if DATA_MEMORY_BUDGET_MB else None
+    options = dict(memory_budget=budget, on_memory=report_memory)
+    warm = get_warm_cache(version)
+    engine = warm.load_engine(**options)
+    if engine is None:
+        engine = DashboardEngine(*read_cleaned_data(), version=version, **options)
+        warm.save_engine(engine)
+    return engine
+
+@st.cache_resource(show_spinner=False)
+def get_warm_cache(version):
+    """Returns the on-disk cache of engine frames and figures for this data version (see warm_cache.py)."""
+    return WarmCache(version)
+
+def report_memory(report):
+    """Counts shared-data evictions on the rerun that caused them."""
+    if report["evicted"]:
+        current_trace().count("shared_data.evictions", len(report["evicted"]))
+
+@st.cache_resource
+def get_figure_cache():
+    """Returns the process-wide figure cache shared by every session."""
+    return FigureCache(max_entries=int(os.environ.get("FIGURE_CACHE_SIZE", "256")))
+
+@st.cache_resource(show_spinner=False)
+def load_published_figures(version):
+    """Returns the prebuilt figure files of a publish bundle made for this data version by the current code, if any."""
+    return published_figures(PUBLISH_DIR, version)
+
+@st.cache_resource
+def get_tracer():
+    """Returns the process-wide rerun tracer, logging to DASHBOARD_TRACE_LOG (default logs/reruns.jsonl)."""
+    return Tracer(os.environ.get("DASHBOARD_TRACE_LOG", os.path.join("logs", "reruns.jsonl")))
+
+def traced_fragment(func):
+    """Makes func a fragment whose fragment-only reruns are traced too, under the view "fragment:<name>".
+
+    On a full rerun the body runs inside main()'s trace; a fragment rerun skips main(),
+    so the body opens its own trace when none is current.
+    """
+    @functools.wraps(func)
+    def body(*args, **kwargs):
+        if not PROFILING or current_trace() is not NULL_TRACE:
+            return func(*args, **kwargs)
+        session = st.session_state.setdefault("trace_session", uuid.uuid4().hex[:8])
+        with get_tracer().rerun(f"fragment:{func.__name__}", session):
+            return func(*args, **kwargs)
+    return st.fragment(body)
+
+def cached_figure(version, sector, view, flow_type, year, build, *variant, lang=DEFAULT_LANGUAGE):
+    """Returns a figure from the shared cache keyed by sector, view, flow type, year and data version.
+
+    Figures labelled in another language than the default get the language as a last variant.
+    On a cache miss a figure from the publish bundle or the warm cache on disk is used before
+    falling back to build(); built figures are written through to the warm cache while it has room.
+    """
+    if lang != DEFAULT_LANGUAGE:
+        variant += (lang,)
+    key = figure_key(version, sector, view, flow_type, year, *variant)
+    cache = get_figure_cache()
+    trace = current_trace()
+    with trace.span(f"figure.{view}"):
+        payload = cache.get_json(key)
+        if payload is not None:
+            trace.count("figure_cache.hit")
+            return deserialize_figure(payload)
+        trace.count("figure_cache.miss")
+        published = load_published_figures(version)
+        if key in published:
+            trace.count("figure_cache.published")
+            path = published[key]
+            if path is None:
+                payload = serialize_figure(None)
+            else:
+                with open(path, encoding="utf-8") as f:
+                    payload = f.read()
+        else:
+            warm = get_warm_cache(version)
+            payload = warm.get_figure(key)
+            if payload is not None:
+                trace.count("figure_cache.warm")
+            else:
+                payload = serialize_figure(build())
+                warm.put_figure(key, payload)
+        cache.put_json(key, payload)
+        return deserialize_figure(payload)
 
 def display_header():
     """Displays the application header with logo and organization name."""
@@ -197,6 +328,17 @@ def display_header():
         """, unsafe_allow_html=True)
     st.markdown("<hr>", unsafe_allow_html=True)
 
+def select_year(years):
+    """Displays the trade-year selector and returns the chosen year."""
+    if st.session_state.get("year") not in years:
+        st.session_state.year = SUT_YEAR if SUT_YEAR in years else years[-1]
+    return st.radio("Trade year", years, horizontal=True, key="year")
+
+def select_language():
+    """Displays the label-language toggle in the sidebar and returns the chosen language code."""
+    return st.sidebar.segmented_control("Labels", list(LANGUAGES), default=DEFAULT_LANGUAGE, format_func=LANGUAGES.get,
+                                        key="lang") or DEFAULT_LANGUAGE
+
 def get_sector_icon(sector):
     """Returns appropriate emoji icon based on sector keywords."""
     sector_lower = sector.lower()
@@ -218,59 +360,28 @@ def get_sector_icon(sector):
         return "💻"
     return "🏭"
 
-def format_value(value):
-    """Formats numerical values into billions and millions for better readability."""
-    if value >= 1_000_000_000:
-        return f"SR {value/1_000_000_000:.2f}B"
-    elif value >= 1_000_000:
-        return f"SR {value/1_000_000:.2f}M"
-    return f"SR {value/1_000_000:.2f}M"
-
-def display_sector_bubbles(sectors_data):
+def display_sector_bubbles(engine, lang=DEFAULT_LANGUAGE):
     """Displays interactive sector selection grid with bubble cards sorted by output value."""
     st.markdown("<h3 style='margin: 2rem 0 1rem 0;'>Select a Sector to Explore</h3>", unsafe_allow_html=True)
     st.markdown("<p style='color:#94a3b8; margin-bottom: 2.5rem;'>Click on any sector to view detailed economic flow analysis</p>", unsafe_allow_html=True)
     
-    sorted_sectors = sorted(sectors_data.items(), key=lambda x: x[1]['output'], reverse=True)
-    
-    sectors_to_display = [
-        "Manufacture of coke and refined petroleum products",
-        "Manufacture of food products",
-        "Manufacture of chemicals and chemical products",
-        "Manufacture of motor vehicles, trailers and semi-trailers",
-        "Manufacture of machinery and equipment n.e.c.",
-        "Manufacture of electrical equipment",
-        "Manufacture of basic metals",
-        "Manufacture of computer, electronic and optical products",
-        "Manufacture of fabricated metal products, except machinery and equipment",
-        "Manufacture of other transport equipment",
-        "Manufacture of other non-metallic mineral products",
-        "Manufacture of wearing apparel",
-        "Manufacture of furniture",
-        "Manufacture of rubber and plastics products",
-        "Manufacture of basic pharmaceutical products and pharmaceutical preparations",
-        "Other manufacturing",
-        "Manufacture of beverages",
-        "Manufacture of paper and paper products",
-        "Manufacture of textiles",
-        "Printing and reproduction of recorded media",
-        "Manufacture of leather and related products",
-        "Manufacture of woods, wood products and cork, except furniture"
-    ]
-    
-    filtered_sectors = [(sector, data) for sector, data in sorted_sectors if sector in sectors_to_display]
+    if st.button("📊 Compare all sectors", key="btn_all_sectors"):
+        st.session_state.view = "all_sectors"
+        st.rerun()
+
+    displayed = engine.dashboard_sectors()
+    filtered_sectors = list(displayed["total_output"].items())
     num_cols = 3
     
     for row_start in range(0, len(filtered_sectors), num_cols):
         cols = st.columns(num_cols)
         row_sectors = filtered_sectors[row_start:row_start + num_cols]
         
-        for col_idx, (sector, data) in enumerate(row_sectors):
+        for col_idx, (sector, output_val) in enumerate(row_sectors):
             with cols[col_idx]:
-                output_val = data['output']
                 display_val = format_value(output_val)
                 icon = get_sector_icon(sector)
-                button_label = f"{icon}\n\n**{sector}**\n\n Sales: {display_val}"
+                button_label = f"{icon}\n\n**{engine.sector_label(sector, lang)}**\n\n Sales: {display_val}"
                 
                 st.markdown("<div class='bubble-container'>", unsafe_allow_html=True)
                 
@@ -282,304 +393,188 @@ def display_sector_bubbles(sectors_data):
                 
                 st.markdown("</div>", unsafe_allow_html=True)
 
-def create_multilevel_sankey(selected_sector, exports_df, imports_df, total_output, total_intermediate, final_consumption, gross_capital_formation, total_exports):
-    """Creates multi-level Sankey diagram showing total-level economic flows with dynamic node sizing."""
-    total_imports = imports_df["2023"].sum()
-
-    pct = lambda val: (val / total_output * 100) if total_output > 0 else 0
-
-    node_values = [total_output, total_exports, final_consumption, total_intermediate, gross_capital_formation, total_imports]
-    node_labels = [
-        f"<b>Sales</b><br>{format_value(total_output)}<br>(100%)",
-        f"<b>Exports</b><br>{format_value(total_exports)}<br>({pct(total_exports):.1f}%)",
-        f"<b>Consumer Sales</b><br>{format_value(final_consumption)}<br>({pct(final_consumption):.1f}%)",
-        f"<b>B2B Sales (Raw Material)</b><br>{format_value(total_intermediate)}<br>({pct(total_intermediate):.1f}%)",
-        f"<b>CAPEX/OPEX</b><br>{format_value(gross_capital_formation)}<br>({pct(gross_capital_formation):.1f}%)",
-        f"<b>Imports</b><br>{format_value(total_imports)}<br>({pct(total_imports):.1f}%)"
-    ]
-
-    min_pad, max_pad = 15, 80
-    if total_output > 0:
-        pad_values = np.interp(node_values, [min(node_values), max(node_values)], [max_pad, min_pad])
-        avg_pad = float(np.mean(pad_values))
-    else:
-        avg_pad = 40
-
-    links = [
-        dict(source=0, target=1, value=total_exports, color="rgba(251, 146, 60, 0.6)"),
-        dict(source=0, target=2, value=final_consumption, color="rgba(52, 211, 153, 0.6)"),
-        dict(source=0, target=3, value=total_intermediate, color="rgba(167, 139, 250, 0.6)"),
-        dict(source=0, target=4, value=gross_capital_formation, color="rgba(168, 85, 247, 0.6)"),
-        dict(source=5, target=0, value=total_imports, color="rgba(96, 165, 250, 0.6)")
-    ]
-
-    fig = go.Figure(data=[go.Sankey(
-        arrangement="snap",
-        node=dict(
-            pad=avg_pad,
-            thickness=30,
-            line=dict(color="rgba(255,255,255,0.2)", width=1),
-            label=node_labels,
-            color=["#3b82f6", "#fb923c", "#34d399", "#a78bfa", "#a855f7", "#60a5fa"],
-            hovertemplate='%{label}<extra></extra>'
-        ),
-        link=dict(
-            source=[l["source"] for l in links],
-            target=[l["target"] for l in links],
-            value=[l["value"] for l in links],
-            color=[l["color"] for l in links],
-            hovertemplate="Flow: %{value:,.0f} SR<extra></extra>"
-        )
-    )])
-
-    fig.update_layout(
-        template="plotly_dark",
-        title=dict(
-            text=f"Economic Flow Analysis — {selected_sector}",
-            font=dict(size=20, color="#f1f5f9", family="Inter")
-        ),
-        font=dict(size=12, family="Inter"),
-        height=700,
-        margin=dict(l=20, r=20, t=80, b=20),
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)"
-    )
-    return fig
-
-def create_expanded_flow_sankey(selected_sector, df_flow, flow_label):
-    """Creates expanded Sankey showing top 10 items with aggregated 'Other' category."""
-    if df_flow.empty:
-        return go.Figure()
-
-    df_flow = df_flow.copy()
-    df_flow["2023"] = pd.to_numeric(df_flow["2023"], errors="coerce").fillna(0)
-
-    total_flow = df_flow["2023"].sum()
-    if total_flow <= 0:
-        return go.Figure()
-
-    df_flow = df_flow.sort_values("2023", ascending=False)
-    top_df = df_flow.head(10)
-    other_df = df_flow.iloc[10:]
-    other_val = other_df["2023"].sum()
-
-    main_label = f"<b>{selected_sector}</b><br><b>{flow_label}</b><br>{format_value(total_flow)}"
-    nodes = [main_label]
-    links = []
-
-    base_color = "rgba(251, 146, 60, 0.7)" if flow_label == "Exports" else "rgba(96, 165, 250, 0.7)"
-    light_color = "rgba(251, 146, 60, 0.4)" if flow_label == "Exports" else "rgba(96, 165, 250, 0.4)"
-
-    for _, row in top_df.iterrows():
-        product = str(row["COMM_NAME_EN"])
-        if len(product) > 40:
-            product = product[:37] + "..."
-        value = row["2023"]
-        percentage = (value / total_flow) * 100
-        nodes.append(f"{product}<br>{format_value(value)}<br>({percentage:.1f}%)")
-        links.append(dict(source=0, target=len(nodes)-1, value=value, color=base_color))
-
-    if other_val >= 1:
-        percentage = (other_val / total_flow) * 100
-        other_label = f"<b>Other {flow_label}</b><br>{format_value(other_val)}<br>({percentage:.1f}%)<br>({len(other_df)} items)"
-        nodes.append(other_label)
-        links.append(dict(source=0, target=len(nodes)-1, value=other_val, color=light_color))
-
-    fig = go.Figure(data=[go.Sankey(
-        arrangement="snap",
-        node=dict(
-            pad=35,
-            thickness=30,
-            line=dict(color="rgba(255,255,255,0.3)", width=1),
-            label=nodes,
-            color=["#3b82f6"] + ["#60a5fa"] * (len(nodes)-1),
-            hovertemplate='%{label}<extra></extra>'
-        ),
-        link=dict(
-            source=[l["source"] for l in links],
-            target=[l["target"] for l in links],
-            value=[l["value"] for l in links],
-            color=[l["color"] for l in links],
-            hovertemplate="Value: SR %{value:,.2f} <br>Share: %{value:,.1%} of total<extra></extra>"
-        )
-    )])
-
-    fig.update_layout(
-        template="plotly_dark",
-        title=dict(
-            text=f"📦 {flow_label} Breakdown — {selected_sector}",
-            font=dict(size=20, color="#f1f5f9", family="Inter")
-        ),
-        font=dict(size=11, family="Inter"),
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)"
-    )
-    return fig
-
-def create_other_items_heatmap(other_df, total_flow, flow_label, base_color):
-    """Creates box heatmap visualization for remaining items sorted from largest to smallest."""
-    other_df = other_df.sort_values("2023", ascending=False).reset_index(drop=True)
-
-    n_cols = 4
-    n_rows = (len(other_df) + n_cols - 1) // n_cols
-
-    matrix = []
-    labels_matrix = []
-
-    max_value = other_df["2023"].max()
-
-    for i in range(n_rows):
-        row_values, row_labels = [], []
-        for j in range(n_cols):
-            idx = i * n_cols + j
-            if idx < len(other_df):
-                item = other_df.iloc[idx]
-                value = item["2023"]
-                pct = (value / total_flow) * 100
-                relative_value = (value / max_value) * 100
-                product_name = item["COMM_NAME_EN"]
-                if len(product_name) > 30:
-                    product_name = product_name[:27] + "..."
-                row_values.append(relative_value)
-                row_labels.append(f"{product_name}<br>{format_value(value)}<br>({pct:.1f}%)")
-            else:
-                row_values.append(0)
-                row_labels.append("")
-        matrix.append(row_values)
-        labels_matrix.append(row_labels)
-
-    matrix = matrix[::-1]
-    labels_matrix = labels_matrix[::-1]
-
-    if flow_label == "Exports":
-        colorscale = [
-            [0.0, "#1e293b"], [0.1, "#78350f"], [0.3, "#d97706"],
-            [0.5, "#f59e0b"], [0.7, "#fbbf24"], [1.0, "#fcd34d"]
-        ]
-    else:
-        colorscale = [
-            [0.0, "#1e293b"], [0.1, "#1e3a8a"], [0.3, "#2563eb"],
-            [0.5, "#3b82f6"], [0.7, "#60a5fa"], [1.0, "#93c5fd"]
-        ]
-
-    fig = go.Figure(data=go.Heatmap(
-        z=matrix,
-        text=labels_matrix,
-        texttemplate="%{text}",
-        textfont={"size": 12, "family": "Inter"},
-        hoverongaps=False,
-        hoverinfo="text",
-        colorscale=colorscale,
-        showscale=False
-    ))
-
-    other_total = other_df["2023"].sum()
-    other_pct = (other_total / total_flow) * 100
-
-    fig.update_layout(
-        height=max(400, n_rows * 120),
-        template="plotly_dark",
-        margin=dict(l=20, r=20, t=120, b=40),
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)",
-        title=dict(
-            text=f"📦 Remaining {len(other_df)} {flow_label} Items<br>"
-                 f"<sub>Total: {format_value(other_total)} ({other_pct:.1f}% of flow)</sub>",
-            font=dict(size=16, color="#f1f5f9", family="Inter"),
-            x=0.5,
-            xanchor='center'
-        )
-    )
-
-    fig.update_xaxes(showticklabels=False, showgrid=False)
-    fig.update_yaxes(showticklabels=False, showgrid=False)
-
-    return fig
-
-def create_bar_chart(df, title, value_column="2023"):
-    """Creates horizontal bar chart for top commodities with adaptive labels and minimum visibility."""
+def display_commodity_table(df, key, year, height=400, lang=DEFAULT_LANGUAGE):
+    """Shows a filterable, sortable table of a sector's commodities; only the visible page is sent to the browser."""
+    sortable = sortable_columns(df)
+    c_filter, c_sort, c_order, c_columns = st.columns([3, 2, 1, 3])
+    with c_filter:
+        text = st.text_input("Filter commodities", key=f"{key}_filter", placeholder="Name or HS code")
+    with c_sort:
+        sort_by = st.selectbox("Sort by", sortable, index=sortable.index(year), key=f"{key}_sort")
+    with c_order:
+        descending = st.toggle("Descending", value=True, key=f"{key}_descending")
+    with c_columns:
+        columns = st.multiselect("Columns", list(df.columns), default=default_columns(df, lang), key=f"{key}_columns_{lang}")
+
+    # Rows arrive sorted by the selected year, largest first.
+    if sort_by == year and descending:
+        sort_by = None
+    with current_trace().span("table_query"):
+        rows = query_rows(df, sort_by, descending, text)
+    page_count = max(1, -(-len(rows) // TABLE_PAGE_ROWS))
+    page = 0
+    if page_count > 1:
+        page = st.number_input(f"Table page (of {page_count}, {len(rows):,} rows)", 1, page_count, 1, key=f"{key}_page") - 1
+    with current_trace().span("dataframe"):
+        st.dataframe(page_rows(rows, columns, page, TABLE_PAGE_ROWS), use_container_width=True, height=height, hide_index=True)
+
+@traced_fragment
+def display_product_analysis(version, engine, selected_sector, year, lang=DEFAULT_LANGUAGE):
+    """Shows the top-commodities chart and table for the chosen flow only; switching flows reruns just this section."""
+    flow_type = st.segmented_control("Products", list(PRODUCT_TABS), default="Exports", format_func=PRODUCT_TABS.get,
+                                     key="product_flow", label_visibility="collapsed") or "Exports"
+    df = engine.sector_index(flow_type, year).get(selected_sector)
     if df.empty:
-        return None
-
-    chart_df = df.copy()
-    chart_df[value_column] = pd.to_numeric(chart_df[value_column], errors='coerce').fillna(0)
-    chart_df = chart_df.nlargest(15, value_column).copy()
-    chart_df = chart_df.sort_values(value_column, ascending=True)
-    
-    total_value = chart_df[value_column].sum()
-    if total_value == 0:
-        return None
-
-    def format_value_label(x):
-        if x == 0:
-            return "0 (0.0%)"
-        if x >= 1e9:
-            val = f"{x / 1e9:.2f}B"
-        elif x >= 1e6:
-            val = f"{x / 1e6:.2f}M"
-        else:
-            val = f"{x:,.0f}"
-        pct = f"{(x / total_value) * 100:.1f}%"
-        return f"{val} ({pct})"
+        st.info(f"No {flow_type[:-1].lower()} data available for this sector.")
+        return
+    title = engine.sector_label(selected_sector, lang)
+    chart = cached_figure(version, selected_sector, "bar", flow_type, year,
+                          lambda: flow_bar_chart(title, df, flow_type, year, lang), lang=lang)
+    if chart:
+        st.plotly_chart(chart, config={"displayModeBar": False}, use_container_width=True)
+    display_commodity_table(df, f"table_{selected_sector}_{flow_type}", year, lang=lang)
+
+@traced_fragment
+def display_remaining_items(version, selected_sector, df_flow, flow_type, year, lang=DEFAULT_LANGUAGE):
+    """Shows the paged remaining-items heatmap and the paged flow table; paging reruns just this section."""
+    page = 0
+    page_count = heatmap_page_count(len(split_top(df_flow)[1]))
+    if page_count > 1:
+        page = st.number_input(f"Remaining items page (of {page_count})", 1, page_count, 1,
+                               key=f"heatmap_page_{selected_sector}_{flow_type}") - 1
+
+    heatmap_fig = cached_figure(version, selected_sector, "heatmap", flow_type, year,
+                                lambda: flow_heatmap(df_flow, flow_type, year, page, lang), page, lang=lang)
+    if heatmap_fig is not None:
+        st.plotly_chart(heatmap_fig, config={"displayModeBar": False}, use_container_width=True)
+
+    st.markdown("<h4 style='margin: 2rem 0 1rem 0;'>📋 Data Table</h4>", unsafe_allow_html=True)
+    display_commodity_table(df_flow, f"table_{selected_sector}_{flow_type}_expanded", year, height=500, lang=lang)
+
+@traced_fragment
+def display_hs_drilldown(version, engine, selected_sector, flow_type, year, lang=DEFAULT_LANGUAGE):
+    """Drills a flow down through HS chapters, headings and subheadings; drilling reruns just this section."""
+    parent = None
+    groups = engine.hs_breakdown(selected_sector, flow_type, year, lang=lang)
+    for col, level in zip(st.columns(len(HS_LEVELS)), HS_LEVELS.values()):
+        labels = dict(zip(groups["code"], groups["label"]))
+        with col:
+            choice = st.selectbox(level, [None] + list(labels), key=f"hs_{selected_sector}_{flow_type}_{year}_{parent}",
+                                  format_func=lambda code: f"All {level.lower()}s" if code is None else f"{code} ({labels[code]})")
+        if choice is None:
+            break
+        parent = choice
+        groups = engine.hs_breakdown(selected_sector, flow_type, year, parent, lang)
+
+    if groups.empty:
+        st.info(f"No {flow_type.lower()} data available for this selection.")
+        return
+    title = engine.sector_label(selected_sector, lang)
+    fig = cached_figure(version, selected_sector, "hs", flow_type, year,
+                        lambda: hs_flow_sankey(title, groups, flow_type, year, parent), parent, lang=lang)
+    st.plotly_chart(fig, config={"displayModeBar": False}, use_container_width=True)
+    table = groups.assign(share=groups["value"] / groups["value"].sum())
+    st.dataframe(table.rename(columns=str.title).rename(columns={"Code": "HS code"}), use_container_width=True, hide_index=True)
+
+def display_all_sectors(version, engine, year, lang=DEFAULT_LANGUAGE):
+    """Shows every landing-page sector's sales split and imports side by side, from one cross-sector matrix."""
+    if st.button("⬅️ Back to Sectors", type="primary"):
+        st.session_state.view = "bubbles"
+        st.rerun()
+    st.markdown("<h3 class='sankey-title'>All Sectors — Sales by Use and Imports</h3>", unsafe_allow_html=True)
+
+    matrix = engine.sector_matrix(year).rename(index=lambda sector: engine.sector_label(sector, lang))
+    chart = st.segmented_control("Chart", list(ALL_SECTORS_CHARTS), default="Sankey", key="all_sectors_chart",
+                                 label_visibility="collapsed") or "Sankey"
+    fig = cached_figure(version, None, "all_sectors", None, year, lambda: ALL_SECTORS_CHARTS[chart](matrix, year), chart,
+                        lang=lang)
+    st.plotly_chart(fig, config={"displayModeBar": False}, use_container_width=True)
+    if year != SUT_YEAR:
+        st.caption(f"Sales and demand figures are from the {SUT_YEAR} input-output table; imports are for {year}.")
+
+    shares = matrix.drop(columns="sales").div(matrix["sales"].where(matrix["sales"] > 0), axis=0)
+    table = matrix.rename(columns=SUMMARY_LABELS).join(shares.rename(columns=lambda c: f"{SUMMARY_LABELS[c]} share"))
+    st.dataframe(table, use_container_width=True)
+
+def open_search_hit(sector, flow_type, code):
+    """Jumps to a sector's expanded flow view with its table filtered to one commodity code."""
+    st.session_state.selected_sector = sector
+    st.session_state.selected_flow_type = flow_type
+    st.session_state.view = "sankey_expanded"
+    st.session_state[f"table_{sector}_{flow_type}_expanded_filter"] = code
+    st.session_state[f"table_{sector}_{flow_type}_expanded_page"] = 1
+
+def display_commodity_search(engine, lang=DEFAULT_LANGUAGE):
+    """Searches commodities of every sector by English or Arabic name or HS code from the sidebar."""
+    query = st.sidebar.text_input("🔎 Search commodities", key="commodity_search", placeholder="Name, اسم or HS code")
+    if not query.strip():
+        return
+    with current_trace().span("search"):
+        hits = engine.search_index.search(query, SEARCH_RESULTS)
+    if hits.empty:
+        st.sidebar.caption("No commodities match.")
+        return
+    years = engine.years[-2:]
+    amounts = format_amount(hits[years].to_numpy().ravel()).reshape(len(hits), len(years))
+    for i, (hit, row_amounts) in enumerate(zip(hits.to_dict("records"), amounts)):
+        values = " · ".join(f"{y}: {amount}" for y, amount in zip(years, row_amounts))
+        st.sidebar.button(
+            f"**{hit[COMMODITY_NAME[lang]]}**  \n{hit[SECTOR_NAME[lang]]} · {hit['flow']}  \nHS {hit['hs_code']} · {values}",
+            key=f"search_hit_{i}", use_container_width=True, on_click=open_search_hit,
+            args=(hit["CC_DESC_EN"], hit["flow"], hit["hs_code"]),
+        )
 
-    chart_df["label_text"] = chart_df[value_column].apply(format_value_label)
-
-    max_val = chart_df[value_column].max()
-    if max_val == 0:
-        return None
-        
-    min_visible_val = 0.02 * max_val
-    chart_df["display_value"] = np.where(
-        chart_df[value_column] < min_visible_val, 
-        min_visible_val, 
-        chart_df[value_column]
-    )
-
-    fig = px.bar(
-        chart_df,
-        y="COMM_NAME_EN",
-        x="display_value",
-        color=value_column,
-        title=title,
-        color_continuous_scale=["#1e293b", "#3b82f6", "#60a5fa"],
-        labels={"COMM_NAME_EN": "Commodity", value_column: "Value (SR)"},
-        orientation="h",
-        text="label_text",
-    )
-
-    threshold = 0.15 * max_val
-    textpositions = np.where(chart_df[value_column] < threshold, "outside", "inside")
-
-    fig.update_traces(
-        hovertemplate="<b>%{y}</b><br>Value: SR %{customdata[0]:,.2f}<extra></extra>",
-        textposition=textpositions,
-        textfont=dict(color="white", size=11),
-        insidetextanchor="middle",
-        cliponaxis=False,
-        customdata=np.expand_dims(chart_df[value_column], axis=1),
-    )
-
-    fig.update_layout(
-        template="plotly_dark",
-        height=650,
-        title_font=dict(size=18, color="#f1f5f9", family="Inter"),
-        margin=dict(l=20, r=40, t=60, b=40),
-        showlegend=False,
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)",
-        yaxis=dict(tickfont=dict(size=10)),
-        xaxis=dict(
-            gridcolor="rgba(148, 163, 184, 0.1)",
-            range=[0, max_val * 1.25],
-        ),
-    )
-
-    return fig
+def is_admin():
+    """True for usernames listed under [profiling] admins, or with ?admin=<[profiling] admin_token> in the URL."""
+    if st.session_state.get("username") in PROFILING_SECRETS.get("admins", []):
+        return True
+    token = PROFILING_SECRETS.get("admin_token")
+    return bool(token) and st.query_params.get("admin") == token
+
+def display_admin_panel(tracer):
+    """Shows rerun timing percentiles per view and span, plus cache counters, in the sidebar."""
+    with st.sidebar.expander("⏱️ Rerun profile", expanded=False):
+        rows = tracer.summary()
+        if not rows:
+            st.caption("No reruns recorded yet.")
+            return
+        st.dataframe(pd.DataFrame(rows).round(1), hide_index=True, use_container_width=True)
+        counters = tracer.counter_totals()
+        hits, misses = counters.get("figure_cache.hit", 0), counters.get("figure_cache.miss", 0)
+        if hits + misses:
+            st.caption(f"Figure cache: {hits} hits, {misses} misses ({hits / (hits + misses):.0%} hit rate), "
+                       f"{counters.get('figure_cache.published', 0)} served from the publish bundle, "
+                       f"{counters.get('figure_cache.warm', 0)} from the warm cache")
+        st.caption(f"Shared figure cache: {get_figure_cache().stats()}")
+        memory = load_engine(data_version()).memory_report()
+        budget = f" of {memory['budget'] / 2**20:.0f} MB" if memory["budget"] else ""
+        st.caption(f"Shared data: {memory['total'] / 2**20:.1f} MB{budget}, {memory['evictions']} evictions")
+        st.dataframe(pd.DataFrame({"MB": pd.Series(memory["components"]) / 2**20}).round(2), use_container_width=True)
+        if st.button("Clear profile", key="clear_profile"):
+            tracer.clear()
 
 def main():
-    """Main application entry point handling authentication, data loading, and view navigation."""
-    imports, exports, sut_io = load_data()
+    """Main application entry point: renders the dashboard, traced per rerun when profiling is enabled."""
+    if not PROFILING:
+        render_dashboard()
+        return
+    tracer = get_tracer()
+    session = st.session_state.setdefault("trace_session", uuid.uuid4().hex[:8])
+    with tracer.rerun(st.session_state.get("view", "bubbles"), session):
+        render_dashboard()
+    if is_admin():
+        display_admin_panel(tracer)
+
+def render_dashboard():
+    """Handles data loading and view navigation."""
+    trace = current_trace()
+    with trace.span("data_load"):
+        version = data_version()
+        engine = load_engine(version)
     display_header()
+    lang = select_language()
+    display_commodity_search(engine, lang)
+    year = select_year(engine.years)
 
     if "view" not in st.session_state:
         st.session_state.view = "bubbles"
@@ -588,23 +583,13 @@ def main():
     if "selected_flow_type" not in st.session_state:
         st.session_state.selected_flow_type = None
 
-    sectors = sorted(set(imports["CC_DESC_EN"].dropna()) | set(exports["CC_DESC_EN"].dropna()))
-    sectors_data = {}
-    for sector in sectors:
-        sut_df = sut_io[sut_io["Input-Output Tables (IOTs) 2018 (Thousands of Saudi riyals) - Economic Activities (ISIC Rev. 4)"]
-                        .astype(str).str.contains(sector, case=False, na=False)]
-        try:
-            total_intermediate = sut_df["Total Intermediate Consumption"].astype(float).sum() * 1000
-            final_consumption = sut_df["Final consumption expenditures"].astype(float).sum() * 1000
-            gross_capital_formation = sut_df['Gross capital formation'].astype(float).sum() * 1000
-            total_exports = sut_df['Total Export'].astype(float).sum() * 1000
-            total_output = total_intermediate + final_consumption + gross_capital_formation + total_exports
-        except Exception:
-            total_output = 0
-        sectors_data[sector] = {"output": total_output}
-
     if st.session_state.view == "bubbles":
-        display_sector_bubbles(sectors_data)
+        with trace.span("bubbles"):
+            display_sector_bubbles(engine, lang)
+
+    elif st.session_state.view == "all_sectors":
+        with trace.span("all_sectors"):
+            display_all_sectors(version, engine, year, lang)
 
     elif st.session_state.view == "sankey":
         selected_sector = st.session_state.selected_sector
@@ -613,54 +598,52 @@ def main():
             st.session_state.selected_flow_type = None
             st.rerun()
 
-        st.markdown(f"<h3 class='sankey-title'>Sector Analysis — {selected_sector}</h3>", unsafe_allow_html=True)
+        sector_title = engine.sector_label(selected_sector, lang)
+        st.markdown(f"<h3 class='sankey-title'>Sector Analysis — {sector_title}</h3>", unsafe_allow_html=True)
         
-        imp_df = imports[imports["CC_DESC_EN"] == selected_sector]
-        exp_df = exports[exports["CC_DESC_EN"] == selected_sector]
-        sut_df = sut_io[sut_io["Input-Output Tables (IOTs) 2018 (Thousands of Saudi riyals) - Economic Activities (ISIC Rev. 4)"]
-                        .astype(str).str.contains(selected_sector, case=False, na=False)]
-
-        try:
-            total_intermediate = sut_df["Total Intermediate Consumption"].astype(float).sum() * 1000
-            final_consumption = sut_df["Final consumption expenditures"].astype(float).sum() * 1000
-            gross_capital_formation = sut_df['Gross capital formation'].astype(float).sum() * 1000
-            total_exports = sut_df['Total Export'].astype(float).sum() * 1000
-            total_output = total_intermediate + final_consumption + gross_capital_formation + total_exports
-        except Exception as e:
-            st.error(f"Error calculating totals: {e}")
-            total_intermediate = final_consumption = gross_capital_formation = total_exports = total_output = 0
-
-        total_import = imp_df['2023'].astype(float).sum()
-
-        if total_output > 0:
-            exports_pct = (total_exports / total_output) * 100
-            final_demand_pct = (final_consumption / total_output) * 100
-            intermediate_pct = (total_intermediate / total_output) * 100
-            import_pct = (total_import / total_output) * 100
-            capex_pct = (gross_capital_formation / total_output) * 100
-            total_output_pct = 100
-        else:
-            exports_pct = final_demand_pct = intermediate_pct = import_pct = capex_pct = total_output_pct = 0
+        with trace.span("summary"):
+            if selected_sector in engine.metrics.index:
+                summary = engine.sector_summary(selected_sector, year)
+            else:
+                st.error(f"No metrics available for {selected_sector}")
+                summary = {"isic_code": None, "totals": dict.fromkeys(SUMMARY_FIELDS, 0.0)}
+        totals = summary["totals"]
 
         c1, c2, c3, c4, c5, c6 = st.columns(6)
-        metrics_data = [
-            ("Sales", total_output, total_output_pct),
-            ("Exports", total_exports, exports_pct),
-            ("Imports", total_import, import_pct),
-            ("Consumer Sales", final_consumption, final_demand_pct),
-            ("B2B Sales (Raw Material)", total_intermediate, intermediate_pct),
-            ("CAPEX/OPEX", gross_capital_formation, capex_pct)
-        ]
-
-        for col, (label, val, pct) in zip([c1, c2, c3, c4, c5, c6], metrics_data):
+        card_labels = list(SUMMARY_LABELS.values())
+        card_values = list(totals.values())
+        card_amounts = format_amount(card_values)
+        card_percents = format_percent(card_values, max(totals["sales"], 0))
+
+        for col, label, amount, pct in zip([c1, c2, c3, c4, c5, c6], card_labels, card_amounts, card_percents):
             with col:
                 st.markdown(f"""
                     <div class="metric-card">
                         <div class="metric-label">{label}</div>
-                        <div class="metric-value">{format_value(val)}</div>
-                        <div class="metric-subtext">{pct:.1f}%</div>
+                        <div class="metric-value">{amount}</div>
+                        <div class="metric-subtext">{pct}</div>
                     </div>
                 """, unsafe_allow_html=True)
+
+        with trace.span("io_model"):
+            io_model = engine.io_model
+        isic_code = summary["isic_code"]
+        if io_model.position(isic_code) is not None:
+            st.markdown("<h4 style='margin: 2rem 0 1rem 0;'>🔗 Supply-Chain Linkages</h4>", unsafe_allow_html=True)
+            linkage_data = [
+                ("Output Multiplier", io_model.output_multiplier(isic_code), "SR of output per SR of final demand"),
+                ("Backward Linkage", io_model.backward_linkage(isic_code), "relative to average sector"),
+                ("Forward Linkage", io_model.forward_linkage(isic_code), "relative to average sector"),
+            ]
+            for col, (label, val, note) in zip(st.columns(3), linkage_data):
+                with col:
+                    st.markdown(f"""
+                        <div class="metric-card">
+                            <div class="metric-label">{label}</div>
+                            <div class="metric-value">{val:.2f}×</div>
+                            <div class="metric-subtext">{note}</div>
+                        </div>
+                    """, unsafe_allow_html=True)
         
         st.markdown("<hr>", unsafe_allow_html=True)
 
@@ -677,30 +660,29 @@ def main():
                 st.session_state.view = "sankey_expanded"
                 st.rerun()
 
-        sankey_fig = create_multilevel_sankey(selected_sector, exp_df, imp_df,
-                                               total_output, total_intermediate, final_consumption, gross_capital_formation, total_exports)
+        chain_options = None
+        if io_model.position(isic_code) is not None:
+            expand_b2b = st.toggle("Expand B2B sales into purchasing industries", key="expand_b2b")
+            if expand_b2b:
+                opt1, opt2, opt3 = st.columns(3)
+                with opt1:
+                    tiers = st.radio("Supply-chain depth", [1, 2], horizontal=True, key="b2b_tiers",
+                                     format_func=lambda t: f"{t} tier" + ("s" if t > 1 else ""))
+                with opt2:
+                    top_k = st.slider("Industries per tier", 3, 20, 8, key="b2b_top_k")
+                with opt3:
+                    min_share = st.slider("Minimum flow (% of B2B sales)", 0.0, 5.0, 1.0, 0.5, key="b2b_min_share")
+                chain_options = (tiers, top_k, min_share)
+
+        sankey_fig = cached_figure(version, selected_sector, "overview", None, year,
+                                   lambda: sector_overview(sector_title, summary, io_model, chain_options), chain_options,
+                                   lang=lang)
         st.plotly_chart(sankey_fig, config={"displayModeBar": False}, use_container_width=True)
+        if year != SUT_YEAR:
+            st.caption(f"Sales and demand figures are from the {SUT_YEAR} input-output table; imports are for {year}.")
 
         st.markdown("<h4 style='margin: 3rem 0 1.5rem 0;'>📦 Detailed Product Analysis</h4>", unsafe_allow_html=True)
-        tab1, tab2 = st.tabs(["📤 Export Products", "📥 Import Products"])
-        
-        with tab1:
-            if not exp_df.empty:
-                exp_chart = create_bar_chart(exp_df, f"Top Exported Commodities — {selected_sector}")
-                if exp_chart:
-                    st.plotly_chart(exp_chart, config={"displayModeBar": False}, use_container_width=True)
-                st.dataframe(exp_df, use_container_width=True, height=400)
-            else:
-                st.info("No export data available for this sector.")
-        
-        with tab2:
-            if not imp_df.empty:
-                imp_chart = create_bar_chart(imp_df, f"Top Imported Commodities — {selected_sector}")
-                if imp_chart:
-                    st.plotly_chart(imp_chart, config={"displayModeBar": False}, use_container_width=True)
-                st.dataframe(imp_df, use_container_width=True, height=400)
-            else:
-                st.info("No import data available for this sector.")
+        display_product_analysis(version, engine, selected_sector, year, lang)
 
     elif st.session_state.view == "sankey_expanded":
         selected_sector = st.session_state.selected_sector
@@ -711,28 +693,22 @@ def main():
             st.session_state.selected_flow_type = None
             st.rerun()
         
-        if flow_type == "Exports":
-            df_flow = exports[exports["CC_DESC_EN"] == selected_sector]
-        else:
-            df_flow = imports[imports["CC_DESC_EN"] == selected_sector]
+        with trace.span("sector_lookup"):
+            df_flow = engine.sector_index(flow_type, year).get(selected_sector)
 
+        breakdown = st.segmented_control("Breakdown", BREAKDOWNS, default=BREAKDOWNS[0], key="flow_breakdown",
+                                         label_visibility="collapsed") or BREAKDOWNS[0]
         if df_flow.empty:
             st.info(f"No {flow_type.lower()} data available for this sector.")
+        elif breakdown == "HS codes":
+            display_hs_drilldown(version, engine, selected_sector, flow_type, year, lang)
         else:
-            expanded_fig = create_expanded_flow_sankey(selected_sector, df_flow, flow_type)
+            expanded_fig = cached_figure(version, selected_sector, "expanded", flow_type, year,
+                                         lambda: create_expanded_flow_sankey(engine.sector_label(selected_sector, lang), df_flow,
+                                                                             flow_type, year, lang=lang), lang=lang)
             st.plotly_chart(expanded_fig, config={"displayModeBar": False}, use_container_width=True)
 
-            df_sorted = df_flow.sort_values("2023", ascending=False)
-            other_df = df_sorted.iloc[10:]
-            total_flow = df_flow["2023"].sum()
-
-            if not other_df.empty:
-                base_color = "rgba(251, 146, 60, 0.7)" if flow_type == "Exports" else "rgba(96, 165, 250, 0.7)"
-                heatmap_fig = create_other_items_heatmap(other_df, total_flow, flow_type, base_color)
-                st.plotly_chart(heatmap_fig, config={"displayModeBar": False}, use_container_width=True)
-            
-            st.markdown("<h4 style='margin: 2rem 0 1rem 0;'>📋 Data Table</h4>", unsafe_allow_html=True)
-            st.dataframe(df_flow, use_container_width=True, height=500)
+            display_remaining_items(version, selected_sector, df_flow, flow_type, year, lang)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""Times the data, aggregation and chart stages of the dashboard on real and synthetically scaled data.
+
+Usage (from the repository root):
+    python benchmarks/bench.py                          # scales 1, 10 and 100
+    python benchmarks/bench.py --scales 1,10,100,1000 --repeat 3
+    python benchmarks/bench.py --save                   # store results as the baseline
+    python benchmarks/bench.py --compare                # flag stages slower than the baseline
+
+Scale 1 is the shipped cleaned_data; load_store is skipped when the columnar store is
+missing or stale rather than timing the CSV fallback. Scale N concatenates N copies of
+each trade table with values jittered per copy, so every row count stays realistic in
+shape (same sectors, same text columns) while growing N times; the SUT table is not scaled.
+
+Each stage is timed ``--repeat`` times (median and min reported), then run once more
+under tracemalloc for its peak Python/NumPy allocation. Nothing here imports Streamlit.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from charts import (  # noqa: E402
+    create_bar_chart,
+    create_expanded_flow_sankey,
+    create_multilevel_sankey,
+    flow_heatmap,
+)
+from datastore import read_cleaned_data, read_csv_data, read_store, store_is_current  # noqa: E402
+from engine import DashboardEngine  # noqa: E402
+from io_engine import build_io_model, supply_chain_flows  # noqa: E402
+from sector_metrics import build_sector_metrics  # noqa: E402
+from time_series import build_trade_long, year_columns, year_view  # noqa: E402
+from trade_index import SectorIndex  # noqa: E402
+
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baseline.json")
+YEAR = "2023"
+
+
+def scale_trade(df, factor, seed=0):
+    """Returns factor copies of a trade table, each copy's year values multiplied by random jitter."""
+    if factor == 1:
+        return df
+    rng = np.random.default_rng(seed)
+    scaled = pd.concat([df] * factor, ignore_index=True)
+    years = year_columns(df)
+    jitter = rng.lognormal(0.0, 0.25, size=(len(scaled), 1))
+    scaled[years] = scaled[years].to_numpy() * jitter
+    return scaled
+
+
+def stages(imports, exports, sut_io):
+    """Returns (name, callable) pairs for every benchmarked stage at one scale."""
+    engine = DashboardEngine(imports, exports, sut_io)
+    sector = engine.metrics["imports_2023"].idxmax()
+    summary = engine.sector_summary(sector, YEAR)
+    index = engine.sector_index("Imports", YEAR)
+    df_flow = index.get(sector)
+    trade_long = engine.trade_long
+
+    yield "sector_metrics", lambda: build_sector_metrics(imports, exports, sut_io)
+    yield "trade_long", lambda: build_trade_long(imports, exports)
+    yield "sector_index", lambda: SectorIndex(year_view(trade_long, "Imports", YEAR), YEAR)
+    yield "sector_lookup_all", lambda: [index.get(name) for name in index.sectors]
+    yield "engine", lambda: DashboardEngine(imports, exports, sut_io)
+    yield "io_model", lambda: build_io_model(sut_io)
+    yield "supply_chain", lambda: supply_chain_flows(engine.io_model, summary["isic_code"], tiers=2)
+    yield "multilevel_sankey", lambda: create_multilevel_sankey(sector, summary["totals"])
+    yield "expanded_sankey", lambda: create_expanded_flow_sankey(sector, df_flow, "Imports", YEAR)
+    yield "heatmap", lambda: flow_heatmap(df_flow, "Imports", YEAR)
+    yield "bar_chart", lambda: create_bar_chart(df_flow, sector, YEAR)
+
+
+def measure(func, repeat):
+    """Returns median/min seconds over repeat runs and the peak traced allocation of one more run, in MB."""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "peak_mb": peak / 2**20}
+
+
+def run(scales, repeat, only=None, log=print):
+    """Runs every stage at every scale and returns the results keyed by scale then stage."""
+    results = {}
+    loaders = {"load_store": read_store, "load_csv": read_csv_data}
+    for scale in scales:
+        imports, exports, sut_io = read_cleaned_data()
+        imports, exports = scale_trade(imports, scale, seed=1), scale_trade(exports, scale, seed=2)
+        rows = len(imports) + len(exports)
+        log(f"scale {scale}x: {rows:,} trade rows")
+
+        scale_results = results[f"{scale}x"] = {}
+        # Loading is only measured on the shipped files; scaled tables exist only in memory.
+        if scale == 1:
+            for name, func in loaders.items():
+                if only and name not in only:
+                    continue
+                if func is read_store and not store_is_current():
+                    log(f"  {name:<20} skipped: no store (build it with python datastore.py)")
+                    continue
+                scale_results[name] = measure(func, repeat)
+        for name, func in stages(imports, exports, sut_io):
+            if only and name not in only:
+                continue
+            scale_results[name] = measure(func, repeat)
+        for name, timing in scale_results.items():
+            timing["rows"] = rows
+            log(f"  {name:<20} {timing['median_s'] * 1000:>10.2f} ms  (min {timing['min_s'] * 1000:.2f})"
+                f"  peak {timing['peak_mb']:>8.1f} MB")
+    return results
+
+
+def compare(results, baseline, tolerance, log=print):
+    """Logs stages slower than the baseline by more than tolerance and returns how many there were."""
+    regressions = 0
+    for scale, scale_results in results.items():
+        for name, timing in scale_results.items():
+            previous = baseline.get("results", {}).get(scale, {}).get(name)
+            if previous is None:
+                continue
+            ratio = timing["median_s"] / previous["median_s"] if previous["median_s"] else float("inf")
+            if ratio > 1 + tolerance:
+                regressions += 1
+                log(f"[slower] {scale} {name}: {previous['median_s'] * 1000:.2f} ms -> "
+                    f"{timing['median_s'] * 1000:.2f} ms ({ratio:.2f}x)")
+    log(f"{regressions} stage(s) slower than baseline by more than {tolerance:.0%}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="1,10,100", help="comma-separated scale factors (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per stage (default: %(default)s)")
+    parser.add_argument("--stage", action="append", help="run only this stage (repeatable)")
+    parser.add_argument("--output", help="also write results to this JSON file")
+    parser.add_argument("--save", action="store_true", help=f"store results as the baseline ({BASELINE_FILE})")
+    parser.add_argument("--compare", action="store_true", help="compare with the stored baseline; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    scales = [int(scale) for scale in args.scales.split(",")]
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": run(scales, args.repeat, args.stage),
+    }
+    for path in filter(None, [args.output, BASELINE_FILE if args.save else None]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {path}")
+    if args.compare:
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            baseline = json.load(f)
+        return 1 if compare(report["results"], baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,558 @@
+"""Simulates concurrent dashboard sessions against app.py and reports rerun latency, throughput and memory.
+
+Usage (from the repository root):
+    python benchmarks/loadtest.py                               # 8 sessions on one server for 60s
+    python benchmarks/loadtest.py --sessions 32 --workers 2 --duration 120
+    python benchmarks/loadtest.py --think 0.5 --seed 7 --json logs/loadtest.json
+    python benchmarks/loadtest.py --url http://localhost:8501   # a server that is already running
+    python benchmarks/loadtest.py --mode apptest                # in-process AppTest, one rerun at a time
+
+By default each worker is a real server: ``streamlit run app.py`` on a free local port,
+with st.secrets credentials stubbed through a temporary secrets file. Its sessions are
+threads in a client process of their own, each holding a websocket to the server and
+speaking Streamlit's protocol as a browser does: it sends the widget states of a click
+and times the rerun until the server reports the script (or, for a widget inside a
+fragment, the fragment) finished. The server runs the sessions' scripts concurrently,
+so latency at a given session count shows how many users one worker sustains. The
+clients share the machine with the servers; on a small machine give them a core.
+
+``--mode apptest`` drives AppTest instead, without a server. AppTest swaps process-wide
+state (the runtime and st.secrets) for each run, so a worker runs one rerun at a time:
+its figures are serialized reruns, the time a session waits for its turn is reported as
+``wait``, and they are no measure of concurrency.
+
+Sessions log in through the real form whenever the app shows it, then follow a
+weighted mix of journeys through the bubble grid, a sector's overview, its product
+flows, its expanded export and import flows, the all-sectors comparison and the year
+toggle, clicking the app's own widgets; sectors are picked at random, weighted toward
+the largest as a landing page would be. A think time (exponential, mean ``--think``
+seconds) separates steps. Every interaction is one timed rerun.
+
+Before timing, each worker logs one session in so the engine load is not counted;
+``--cold`` includes it. The report gives p50/p90/p99 latency per step, throughput in
+reruns per second, and the resident memory of each worker's app process (the server,
+or the AppTest process) after warm-up and at the end.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import numpy as np  # noqa: E402
+from streamlit.proto.BackMsg_pb2 import BackMsg  # noqa: E402
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg  # noqa: E402
+from streamlit.proto.WidgetStates_pb2 import WidgetState  # noqa: E402
+from streamlit.runtime.state.common import user_key_from_element_id  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+from websockets.sync.client import connect  # noqa: E402
+
+APP = os.path.join(ROOT, "app.py")
+USERNAME, PASSWORD = "loadtest", "loadtest"
+PERCENTILES = (50, 90, 99)
+MODES = ("server", "apptest")
+
+# AppTest is not thread-safe: every run replaces the process-wide runtime and secrets.
+_run_lock = threading.Lock()
+
+# Journeys from the bubble grid and back, with their share of the mix.
+JOURNEYS = {
+    "sector_overview": 4,
+    "products_toggle": 2,
+    "exports_flow": 3,
+    "imports_flow": 3,
+    "both_flows": 2,
+    "year_toggle": 1,
+    "all_sectors": 1,
+}
+
+
+class SessionError(Exception):
+    """A rerun raised in the app or the expected widget was not on the page."""
+
+
+class Session:
+    """One simulated browser session: (step, latency, wait) for each of its reruns, and its errors."""
+
+    # Held around each rerun when the app cannot run two at once.
+    run_lock = None
+
+    def __init__(self):
+        self.samples = []
+        self.errors = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+    def _timed(self, step, action):
+        started = time.perf_counter()
+        with self.run_lock or contextlib.nullcontext():
+            running = time.perf_counter()
+            try:
+                action()
+            except Exception as exc:
+                self.errors.append((step, f"{type(exc).__name__}: {exc}"))
+                raise
+            finally:
+                self.samples.append((step, time.perf_counter() - started, running - started))
+
+
+class AppTestSession(Session):
+    """A session driving its own AppTest of app.py, one rerun at a time per process."""
+
+    run_lock = _run_lock
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.app = AppTest.from_file(APP, default_timeout=timeout)
+        self.app.secrets["credentials"] = {"username": USERNAME, "password": PASSWORD}
+
+    def _run(self, node):
+        node.run()
+        if self.app.exception:
+            raise SessionError(self.app.exception[0].message)
+
+    def _button(self, key=None, label=None):
+        for button in self.app.button:
+            if (key and button.key == key) or (label and button.label.startswith(label)):
+                return button
+        raise SessionError(f"no button {key or label!r} in view {self.app.session_state['view']!r}")
+
+    def click(self, step, key=None, label=None):
+        self._timed(step, lambda: self._run(self._button(key, label).click()))
+
+    def login(self):
+        """Opens the app and submits the stubbed credentials if it shows the login form."""
+        self._timed("first_page", lambda: self._run(self.app))
+        if not any(button.label == "Login" for button in self.app.button):
+            return
+
+        def submit():
+            self.app.text_input[0].input(USERNAME)
+            self.app.text_input[1].input(PASSWORD)
+            self._run(self._button(label="Login").click())
+
+        self._timed("login", submit)
+
+    def sectors(self):
+        """Returns the sectors on the bubble grid, in page order (largest output first)."""
+        return [button.key[len("bubble_"):] for button in self.app.button
+                if button.key and button.key.startswith("bubble_")]
+
+    def toggle_year(self):
+        def toggle():
+            radio = self.app.radio(key="year")
+            self._run(radio.set_value(next(year for year in radio.options if year != radio.value)))
+
+        self._timed("year_toggle", toggle)
+
+    def toggle_products(self):
+        def toggle():
+            control = self.app.segmented_control(key="product_flow")
+            self._run(control.set_value("Imports" if control.value == "Exports" else "Exports"))
+
+        self._timed("products_toggle", toggle)
+
+
+class ServerSession(Session):
+    """A session on a running server, speaking Streamlit's websocket protocol as a browser does.
+
+    The elements received so far stand in for the page the browser shows: a full rerun
+    replaces them, a fragment rerun only the fragment's own.
+    """
+
+    def __init__(self, url, timeout):
+        super().__init__()
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.page_script_hash = ""
+        self.elements = []
+        self.values = {}
+        self._sockets = contextlib.ExitStack()
+        self.socket = None
+
+    def __enter__(self):
+        stream = self.url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.socket = self._sockets.enter_context(
+            connect(stream, subprotocols=["streamlit"], max_size=None, open_timeout=self.timeout))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._sockets.close()
+
+    def _rerun(self, widgets=(), fragment_id=""):
+        """Sends one rerun with the given widget states and reads the server's messages until it finishes."""
+        message = BackMsg()
+        message.rerun_script.page_script_hash = self.page_script_hash
+        message.rerun_script.fragment_id = fragment_id
+        message.rerun_script.widget_states.widgets.extend(widgets)
+        self.socket.send(message.SerializeToString())
+
+        deadline = time.perf_counter() + self.timeout
+        elements = []
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(self.socket.recv(timeout=max(deadline - time.perf_counter(), 0)))
+            kind = forward.WhichOneof("type")
+            if kind == "new_session":
+                # Every script run, including one restarted by st.rerun, starts with a new session message.
+                self.page_script_hash = forward.new_session.page_script_hash
+                elements = []
+            elif kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_type = element.WhichOneof("type")
+                elements.append((element_type, getattr(element, element_type), forward.delta.fragment_id))
+            elif kind == "script_finished" and forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+
+        if fragment_id:
+            elements = [element for element in self.elements if element[2] != fragment_id] + elements
+        self.elements = elements
+        if forward.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+            raise SessionError("app.py failed to compile")
+        for element_type, element, _ in elements:
+            if element_type == "exception":
+                raise SessionError(element.message)
+
+    def _widget(self, element_type, key=None, label=None):
+        """Returns a widget on the page, by key or label prefix, and the fragment it is in ("" for none)."""
+        for found_type, element, fragment_id in self.elements:
+            if found_type != element_type:
+                continue
+            if (key and user_key_from_element_id(element.id) == key) or (label and element.label.startswith(label)):
+                return element, fragment_id
+        raise SessionError(f"no {element_type} {key or label!r} on the page")
+
+    def _set(self, element_type, key, value_field, value):
+        """Reruns with one widget changed, only its fragment when the widget is inside one."""
+        element, fragment_id = self._widget(element_type, key)
+        state = WidgetState(id=element.id)
+        if value_field == "string_array_value":
+            state.string_array_value.data.extend(value)
+        else:
+            setattr(state, value_field, value)
+        self._rerun([state], fragment_id)
+        self.values[element.id] = value
+
+    def click(self, step, key=None, label=None):
+        def click():
+            button, fragment_id = self._widget("button", key, label)
+            self._rerun([WidgetState(id=button.id, trigger_value=True)], fragment_id)
+
+        self._timed(step, click)
+
+    def login(self):
+        """Opens the app and submits the stubbed credentials if it shows the login form."""
+        self._timed("first_page", self._rerun)
+        if not any(element_type == "button" and element.label == "Login"
+                   for element_type, element, _ in self.elements):
+            return
+
+        def submit():
+            fields = [element for element_type, element, _ in self.elements if element_type == "text_input"]
+            button, fragment_id = self._widget("button", label="Login")
+            self._rerun([WidgetState(id=fields[0].id, string_value=USERNAME),
+                         WidgetState(id=fields[1].id, string_value=PASSWORD),
+                         WidgetState(id=button.id, trigger_value=True)], fragment_id)
+
+        self._timed("login", submit)
+
+    def sectors(self):
+        """Returns the sectors on the bubble grid, in page order (largest output first)."""
+        keys = [user_key_from_element_id(element.id) for element_type, element, _ in self.elements
+                if element_type == "button"]
+        return [key[len("bubble_"):] for key in keys if key and key.startswith("bubble_")]
+
+    def toggle_year(self):
+        def toggle():
+            radio, _ = self._widget("radio", key="year")
+            year = self.values.get(radio.id, radio.options[radio.default])
+            self._set("radio", "year", "string_value", next(option for option in radio.options if option != year))
+
+        self._timed("year_toggle", toggle)
+
+    def toggle_products(self):
+        def toggle():
+            control, _ = self._widget("button_group", key="product_flow")
+            selected = self.values.get(control.id, [str(index) for index in control.default])
+            index = next(str(index) for index in range(len(control.options)) if [str(index)] != selected)
+            self._set("button_group", "product_flow", "string_array_value", [index])
+
+        self._timed("products_toggle", toggle)
+
+
+def run_journey(session, journey, sector):
+    """Runs one journey from the bubble grid back to it."""
+    if journey == "all_sectors":
+        session.click("all_sectors", key="btn_all_sectors")
+        session.click("back_to_sectors", label="⬅️ Back to Sectors")
+        return
+    session.click("sector", key=f"bubble_{sector}")
+    if journey == "year_toggle":
+        session.toggle_year()
+    if journey == "products_toggle":
+        session.toggle_products()
+    flows = {"exports_flow": ["exports"], "imports_flow": ["imports"], "both_flows": ["exports", "imports"]}
+    for flow in flows.get(journey, []):
+        session.click(f"{flow}_flow", key=f"btn_{flow}")
+        session.click("back_to_sector", label="⬅️ Back to Sector Overview")
+    session.click("back_to_sectors", label="⬅️ Back to Sectors")
+
+
+def session_loop(session, deadline, think, rng):
+    """Logs in, then runs weighted journeys until the deadline; stops at the first error."""
+    try:
+        with session:
+            session.login()
+            sectors = session.sectors()
+            if not sectors:
+                raise SessionError("no sectors on the landing page")
+            weights = [1 / (rank + 1) for rank in range(len(sectors))]
+            journeys, journey_weights = list(JOURNEYS), list(JOURNEYS.values())
+            while time.perf_counter() < deadline:
+                journey = rng.choices(journeys, journey_weights)[0]
+                run_journey(session, journey, rng.choices(sectors, weights)[0])
+                if think:
+                    time.sleep(rng.expovariate(1 / think))
+    except Exception as exc:
+        if not session.errors:
+            session.errors.append(("session", f"{type(exc).__name__}: {exc}"))
+
+
+def _proc_status_mb(pid, field):
+    with open(f"/proc/{pid}/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def peak_rss_mb(pid="self"):
+    """Returns a process's peak resident set size in MB, or None when it cannot be read."""
+    if pid == "self":
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+    try:
+        return _proc_status_mb(pid, "VmHWM")
+    except OSError:
+        return None
+
+
+def rss_mb(pid="self"):
+    """Returns a process's current resident set size in MB (this process's peak where /proc is unavailable)."""
+    if pid is None:
+        return None
+    try:
+        return _proc_status_mb(pid, "VmRSS")
+    except OSError:
+        return peak_rss_mb() if pid == "self" else None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def streamlit_server(workdir, timeout):
+    """Runs ``streamlit run app.py`` on a free local port with stubbed credentials; yields its URL and process."""
+    secrets_path = os.path.join(workdir, "secrets.toml")
+    with open(secrets_path, "w", encoding="utf-8") as f:
+        f.write(f'[credentials]\nusername = "{USERNAME}"\npassword = "{PASSWORD}"\n')
+    port = free_port()
+    log_path = os.path.join(workdir, "server.log")
+    command = [sys.executable, "-m", "streamlit", "run", APP, "--server.headless", "true",
+               "--server.address", "127.0.0.1", "--server.port", str(port), "--server.fileWatcherType", "none",
+               "--browser.gatherUsageStats", "false", "--secrets.files", secrets_path]
+    with open(log_path, "wb") as log:
+        server = subprocess.Popen(command, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.perf_counter() + timeout
+        while True:
+            try:
+                with urllib.request.urlopen(f"{url}/_stcore/health", timeout=1):
+                    break
+            except OSError:
+                if server.poll() is not None or time.perf_counter() > deadline:
+                    with open(log_path, encoding="utf-8", errors="replace") as f:
+                        raise RuntimeError(f"streamlit server did not start:\n{f.read()[-2000:]}") from None
+                time.sleep(0.2)
+        yield url, server
+    finally:
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def run_sessions(worker, new_session, sessions, duration, think, seed, cold, pid):
+    """Runs a worker's sessions concurrently and returns their samples, errors and the memory of process pid."""
+    started_rss = rss_mb(pid)
+    if not cold:
+        with new_session() as session:
+            session.login()
+    warm_rss = rss_mb(pid)
+
+    runs = [new_session() for _ in range(sessions)]
+    started = time.perf_counter()
+    deadline = started + duration
+    threads = [
+        threading.Thread(target=session_loop, args=(run, deadline, think, random.Random(f"{seed}-{worker}-{i}")))
+        for i, run in enumerate(runs)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "worker": worker,
+        "pid": os.getpid() if pid == "self" else pid,
+        "sessions": sessions,
+        "elapsed": time.perf_counter() - started,
+        "samples": [sample for run in runs for sample in run.samples],
+        "errors": [error for run in runs for error in run.errors],
+        "rss_mb": {"start": started_rss, "warm": warm_rss, "end": rss_mb(pid), "peak": peak_rss_mb(pid)},
+    }
+
+
+def run_worker(mode, worker, sessions, duration, think, seed, timeout, cold, url=None):
+    """Runs one worker: a server of its own (or the one at url), or an AppTest process."""
+    load = (sessions, duration, think, seed, cold)
+    if mode == "apptest":
+        return run_sessions(worker, lambda: AppTestSession(timeout), *load, pid="self")
+    if url:
+        return run_sessions(worker, lambda: ServerSession(url, timeout), *load, pid=None)
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        with streamlit_server(workdir, timeout) as (server_url, server):
+            return run_sessions(worker, lambda: ServerSession(server_url, timeout), *load, pid=server.pid)
+
+
+def summarize(results, mode):
+    """Returns latency percentiles per step and overall, throughput and per-worker memory."""
+    by_step = defaultdict(list)
+    for result in results:
+        for step, seconds, wait in result["samples"]:
+            by_step[step].append((seconds * 1000, wait * 1000))
+    everything = [sample for samples in by_step.values() for sample in samples]
+    elapsed = max(result["elapsed"] for result in results)
+
+    def row(samples):
+        latencies = [ms for ms, _ in samples]
+        points = np.percentile(latencies, PERCENTILES)
+        summary = {
+            "reruns": len(samples),
+            "mean_ms": statistics.fmean(latencies),
+            **{f"p{p}_ms": float(v) for p, v in zip(PERCENTILES, points)},
+            "max_ms": max(latencies),
+        }
+        if mode == "apptest":
+            summary["wait_mean_ms"] = statistics.fmean(wait for _, wait in samples)
+        return summary
+
+    return {
+        "mode": mode,
+        "serialized": mode == "apptest",
+        "sessions": sum(result["sessions"] for result in results),
+        "workers": len(results),
+        "elapsed_s": elapsed,
+        "reruns": len(everything),
+        "throughput_rps": len(everything) / elapsed if elapsed else 0.0,
+        "errors": [{"worker": r["worker"], "step": step, "error": error} for r in results for step, error in r["errors"]],
+        "overall": row(everything) if everything else None,
+        "steps": {step: row(samples) for step, samples in sorted(by_step.items())},
+        "workers_rss_mb": [{"worker": r["worker"], "pid": r["pid"], "sessions": r["sessions"], **r["rss_mb"]}
+                           for r in results],
+    }
+
+
+def _mb(value):
+    return "n/a" if value is None else f"{value:.0f} MB"
+
+
+def print_report(report):
+    serialized = report["serialized"]
+    print(f"{report['sessions']} sessions on {report['workers']} worker(s), {report['elapsed_s']:.1f}s: "
+          f"{report['reruns']} reruns, {report['throughput_rps']:.2f} reruns/s, {len(report['errors'])} errors")
+    if serialized:
+        print("AppTest mode runs one rerun at a time per worker: these are serialized reruns, "
+              "not a concurrency ceiling; use the server mode for that.")
+    header = f"{'step':<18}{'reruns':>8}{'mean':>9}" + "".join(f"{f'p{p}':>9}" for p in PERCENTILES)
+    print(header + f"{'max':>9}" + (f"{'wait':>9}" if serialized else "") + "   (ms)")
+    rows = list(report["steps"].items()) + ([("all", report["overall"])] if report["overall"] else [])
+    for step, row in rows:
+        print(f"{step:<18}{row['reruns']:>8}{row['mean_ms']:>9.0f}"
+              + "".join(f"{row[f'p{p}_ms']:>9.0f}" for p in PERCENTILES)
+              + f"{row['max_ms']:>9.0f}" + (f"{row['wait_mean_ms']:>9.0f}" if serialized else ""))
+    for worker in report["workers_rss_mb"]:
+        if worker["pid"] is None:
+            print(f"worker {worker['worker']} ({worker['sessions']} sessions): external server, memory not measured")
+            continue
+        print(f"worker {worker['worker']} (pid {worker['pid']}, {worker['sessions']} sessions): RSS "
+              f"{_mb(worker['start'])} at start, {_mb(worker['warm'])} warm, {_mb(worker['end'])} at end, "
+              f"{_mb(worker['peak'])} peak")
+    for error in report["errors"][:10]:
+        print(f"error in worker {error['worker']} at {error['step']}: {error['error']}")
+
+
+def split_sessions(sessions, workers):
+    """Spreads sessions over workers as evenly as possible."""
+    return [sessions // workers + (i < sessions % workers) for i in range(workers)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=MODES, default="server",
+                        help="server: websocket sessions on streamlit run; apptest: serialized AppTest (default: %(default)s)")
+    parser.add_argument("--url", help="drive the server already running at this URL instead of starting one")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions in total (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=1, help="server or AppTest processes (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of load after warm-up (default: %(default)s)")
+    parser.add_argument("--think", type=float, default=0.0, help="mean think time between steps in seconds (default: none)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for sector and journey choices")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds one rerun may take (default: %(default)s)")
+    parser.add_argument("--cold", action="store_true", help="count the first engine load instead of warming up")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+    if args.url and (args.mode != "server" or args.workers != 1):
+        parser.error("--url drives one running server: use it with the server mode and a single worker")
+
+    counts = [count for count in split_sessions(args.sessions, args.workers) if count]
+    with ProcessPoolExecutor(max_workers=len(counts)) as pool:
+        futures = [pool.submit(run_worker, args.mode, worker, count, args.duration, args.think, args.seed,
+                               args.timeout, args.cold, args.url)
+                   for worker, count in enumerate(counts)]
+        results = [future.result() for future in futures]
+
+    report = summarize(results, args.mode)
+    print_report(report)
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or ".", exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,480 @@
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from engine import SUT_YEAR, split_top
+from formatting import format_amount, format_percent, format_value, truncate_labels
+from hs_rollup import HS_LEVELS
+from labels import COMMODITY_NAME, DEFAULT_LANGUAGE
+from io_engine import supply_chain_flows
+
+# Past this many "remaining items" the heatmap is split into pages of this size.
+HEATMAP_MAX_CELLS = int(os.environ.get("HEATMAP_MAX_CELLS", "200"))
+HEATMAP_COLUMNS = 4
+
+
+def create_multilevel_sankey(selected_sector, totals, supply_chain=None):
+    """Creates multi-level Sankey diagram showing total-level economic flows with dynamic node sizing.
+
+    ``totals`` is the ``totals`` mapping of ``DashboardEngine.sector_summary``. When
+    ``supply_chain`` is a ``(nodes, links)`` pair from ``supply_chain_flows``, the B2B node
+    is expanded into the purchasing industries tier by tier.
+    """
+    total_output = totals["sales"]
+    total_intermediate = totals["b2b_sales"]
+    final_consumption = totals["consumer_sales"]
+    gross_capital_formation = totals["capex_opex"]
+    total_exports = totals["exports"]
+    total_imports = totals["imports"]
+
+    node_values = [total_output, total_exports, final_consumption, total_intermediate, gross_capital_formation, total_imports]
+    node_names = np.array(["Sales", "Exports", "Consumer Sales", "B2B Sales (Raw Material)", "CAPEX/OPEX", "Imports"], dtype=object)
+    node_percents = format_percent(node_values, total_output)
+    node_percents[0] = "100%"
+    node_labels = ("<b>" + node_names + "</b><br>" + format_amount(node_values) + "<br>(" + node_percents + ")").tolist()
+
+    min_pad, max_pad = 15, 80
+    if total_output > 0:
+        pad_values = np.interp(node_values, [min(node_values), max(node_values)], [max_pad, min_pad])
+        avg_pad = float(np.mean(pad_values))
+    else:
+        avg_pad = 40
+
+    node_colors = ["#3b82f6", "#fb923c", "#34d399", "#a78bfa", "#a855f7", "#60a5fa"]
+    link_source = np.array([0, 0, 0, 0, 5])
+    link_target = np.array([1, 2, 3, 4, 0])
+    link_value = np.array([total_exports, final_consumption, total_intermediate, gross_capital_formation, total_imports], dtype=float)
+    link_color = np.array([
+        "rgba(251, 146, 60, 0.6)", "rgba(52, 211, 153, 0.6)", "rgba(167, 139, 250, 0.6)",
+        "rgba(168, 85, 247, 0.6)", "rgba(96, 165, 250, 0.6)"
+    ])
+
+    if supply_chain is not None:
+        chain_nodes, chain_links = supply_chain
+        extra = chain_nodes.iloc[1:]
+        # The chain's root is the B2B node (3); every other chain node is appended after the base six.
+        position = np.concatenate([[3], len(node_labels) + np.arange(len(extra))])
+        values = extra["value"].to_numpy()
+        node_labels += (
+            truncate_labels(extra["name"], 40) + "<br>" + format_amount(values)
+            + "<br>(" + format_percent(values, total_output) + ")"
+        ).tolist()
+        node_colors += np.where(extra["tier"].to_numpy() == 1, "#c4b5fd", "#ddd6fe").tolist()
+        link_source = np.concatenate([link_source, position[chain_links["source"].to_numpy()]])
+        link_target = np.concatenate([link_target, position[chain_links["target"].to_numpy()]])
+        link_value = np.concatenate([link_value, chain_links["value"].to_numpy()])
+        link_color = np.concatenate([link_color, np.where(
+            chain_links["tier"].to_numpy() == 1, "rgba(167, 139, 250, 0.45)", "rgba(167, 139, 250, 0.25)"
+        )])
+
+    fig = go.Figure(data=[go.Sankey(
+        arrangement="snap",
+        node=dict(
+            pad=avg_pad,
+            thickness=30,
+            line=dict(color="rgba(255,255,255,0.2)", width=1),
+            label=node_labels,
+            color=node_colors,
+            hovertemplate='%{label}<extra></extra>'
+        ),
+        link=dict(
+            source=link_source,
+            target=link_target,
+            value=link_value,
+            color=link_color,
+            hovertemplate="Flow: %{value:,.0f} SR<extra></extra>"
+        )
+    )])
+
+    fig.update_layout(
+        template="plotly_dark",
+        title=dict(
+            text=f"Economic Flow Analysis — {selected_sector}",
+            font=dict(size=20, color="#f1f5f9", family="Inter")
+        ),
+        font=dict(size=12, family="Inter"),
+        height=700,
+        margin=dict(l=20, r=20, t=80, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)"
+    )
+    return fig
+
+
+def create_expanded_flow_sankey(selected_sector, df_flow, flow_label, year=SUT_YEAR, unit="items",
+                                lang=DEFAULT_LANGUAGE):
+    """Creates expanded Sankey showing top 10 items with aggregated 'Other' category.
+
+    Expects ``df_flow`` sorted by the ``year`` value descending, as returned by ``SectorIndex``;
+    ``unit`` names what the rows are in the "Other" node. Items are labelled in ``lang``.
+    """
+    if df_flow.empty:
+        return go.Figure()
+
+    df_flow = df_flow.assign(**{year: df_flow[year].fillna(0)})
+
+    total_flow = df_flow[year].sum()
+    if total_flow <= 0:
+        return go.Figure()
+
+    top_df, other_df = split_top(df_flow)
+    other_val = other_df[year].sum()
+
+    base_color = "rgba(251, 146, 60, 0.7)" if flow_label == "Exports" else "rgba(96, 165, 250, 0.7)"
+    light_color = "rgba(251, 146, 60, 0.4)" if flow_label == "Exports" else "rgba(96, 165, 250, 0.4)"
+
+    top_values = top_df[year].to_numpy()
+    main_label = f"<b>{selected_sector}</b><br><b>{flow_label}</b><br>{format_value(total_flow)}"
+    nodes = [main_label] + (
+        truncate_labels(top_df[COMMODITY_NAME[lang]], 40) + "<br>" + format_amount(top_values)
+        + "<br>(" + format_percent(top_values, total_flow) + ")"
+    ).tolist()
+    link_values = top_values.tolist()
+    link_colors = [base_color] * len(top_values)
+
+    if other_val >= 1:
+        other_pct = format_percent([other_val], total_flow)[0]
+        nodes.append(f"<b>Other {flow_label}</b><br>{format_value(other_val)}<br>({other_pct})<br>({len(other_df)} {unit})")
+        link_values.append(other_val)
+        link_colors.append(light_color)
+
+    fig = go.Figure(data=[go.Sankey(
+        arrangement="snap",
+        node=dict(
+            pad=35,
+            thickness=30,
+            line=dict(color="rgba(255,255,255,0.3)", width=1),
+            label=nodes,
+            color=["#3b82f6"] + ["#60a5fa"] * (len(nodes)-1),
+            hovertemplate='%{label}<extra></extra>'
+        ),
+        link=dict(
+            source=np.zeros(len(link_values), dtype=int),
+            target=np.arange(1, len(link_values) + 1),
+            value=link_values,
+            color=link_colors,
+            hovertemplate="Value: SR %{value:,.2f} <br>Share: %{value:,.1%} of total<extra></extra>"
+        )
+    )])
+
+    fig.update_layout(
+        template="plotly_dark",
+        title=dict(
+            text=f"📦 {flow_label} Breakdown — {selected_sector}",
+            font=dict(size=20, color="#f1f5f9", family="Inter")
+        ),
+        font=dict(size=11, family="Inter"),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)"
+    )
+    return fig
+
+
+def heatmap_page_count(n_items, max_cells=HEATMAP_MAX_CELLS):
+    """Returns how many heatmap pages a tail of n_items needs."""
+    return max(1, -(-n_items // max_cells))
+
+
+def create_other_items_heatmap(other_df, total_flow, flow_label, base_color, year=SUT_YEAR,
+                               page=0, max_cells=HEATMAP_MAX_CELLS, lang=DEFAULT_LANGUAGE):
+    """Creates box heatmap visualization for remaining items, which must be sorted from largest to smallest.
+
+    Tails longer than ``max_cells`` are drawn one page of ``max_cells`` items at a time.
+    """
+    n_items = len(other_df)
+    first = page * max_cells
+    page_df = other_df.iloc[first:first + max_cells]
+
+    n_cols = HEATMAP_COLUMNS
+    n_rows = -(-len(page_df) // n_cols)
+    padding = n_rows * n_cols - len(page_df)
+
+    values = np.nan_to_num(page_df[year].to_numpy(dtype=float))
+    max_value = other_df[year].max()
+    relative_values = values / max_value * 100 if max_value > 0 else np.zeros_like(values)
+
+    labels = (
+        truncate_labels(page_df[COMMODITY_NAME[lang]], 30) + "<br>" + format_amount(values)
+        + "<br>(" + format_percent(values, total_flow) + ")"
+    )
+
+    # Pad to whole rows and flip so the largest items sit in the top row.
+    matrix = np.pad(relative_values, (0, padding)).reshape(n_rows, n_cols)[::-1]
+    labels_matrix = np.pad(labels, (0, padding), constant_values="").reshape(n_rows, n_cols)[::-1]
+
+    if flow_label == "Exports":
+        colorscale = [
+            [0.0, "#1e293b"], [0.1, "#78350f"], [0.3, "#d97706"],
+            [0.5, "#f59e0b"], [0.7, "#fbbf24"], [1.0, "#fcd34d"]
+        ]
+    else:
+        colorscale = [
+            [0.0, "#1e293b"], [0.1, "#1e3a8a"], [0.3, "#2563eb"],
+            [0.5, "#3b82f6"], [0.7, "#60a5fa"], [1.0, "#93c5fd"]
+        ]
+
+    fig = go.Figure(data=go.Heatmap(
+        z=matrix,
+        text=labels_matrix.tolist(),
+        texttemplate="%{text}",
+        textfont={"size": 12, "family": "Inter"},
+        hoverongaps=False,
+        hoverinfo="text",
+        colorscale=colorscale,
+        showscale=False
+    ))
+
+    other_total = other_df[year].sum()
+    other_pct = format_percent([other_total], total_flow)[0]
+    page_note = ""
+    if n_items > max_cells:
+        page_note = f" — items {first + 1}–{first + len(page_df)}"
+
+    fig.update_layout(
+        height=max(400, n_rows * 120),
+        template="plotly_dark",
+        margin=dict(l=20, r=20, t=120, b=40),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        title=dict(
+            text=f"📦 Remaining {n_items} {flow_label} Items{page_note}<br>"
+                 f"<sub>Total: {format_value(other_total)} ({other_pct} of flow)</sub>",
+            font=dict(size=16, color="#f1f5f9", family="Inter"),
+            x=0.5,
+            xanchor='center'
+        )
+    )
+
+    fig.update_xaxes(showticklabels=False, showgrid=False)
+    fig.update_yaxes(showticklabels=False, showgrid=False)
+
+    return fig
+
+
+def create_bar_chart(df, title, value_column=SUT_YEAR, lang=DEFAULT_LANGUAGE):
+    """Creates horizontal bar chart for top commodities with adaptive labels and minimum visibility.
+
+    Expects ``df`` sorted by ``value_column`` descending, as returned by ``SectorIndex``.
+    """
+    if df.empty:
+        return None
+
+    name_column = COMMODITY_NAME[lang]
+    chart_df = df.head(15).iloc[::-1].copy()
+    chart_df[value_column] = chart_df[value_column].fillna(0)
+    
+    total_value = chart_df[value_column].sum()
+    if total_value == 0:
+        return None
+
+    values = chart_df[value_column].to_numpy()
+    chart_df["label_text"] = format_amount(values, prefix="") + " (" + format_percent(values, total_value) + ")"
+
+    max_val = chart_df[value_column].max()
+    if max_val == 0:
+        return None
+        
+    min_visible_val = 0.02 * max_val
+    chart_df["display_value"] = np.where(
+        chart_df[value_column] < min_visible_val, 
+        min_visible_val, 
+        chart_df[value_column]
+    )
+
+    fig = px.bar(
+        chart_df,
+        y=name_column,
+        x="display_value",
+        color=value_column,
+        title=title,
+        color_continuous_scale=["#1e293b", "#3b82f6", "#60a5fa"],
+        labels={name_column: "Commodity", value_column: "Value (SR)"},
+        orientation="h",
+        text="label_text",
+    )
+
+    threshold = 0.15 * max_val
+    textpositions = np.where(chart_df[value_column] < threshold, "outside", "inside")
+
+    fig.update_traces(
+        hovertemplate="<b>%{y}</b><br>Value: SR %{customdata[0]:,.2f}<extra></extra>",
+        textposition=textpositions,
+        textfont=dict(color="white", size=11),
+        insidetextanchor="middle",
+        cliponaxis=False,
+        customdata=np.expand_dims(chart_df[value_column], axis=1),
+    )
+
+    fig.update_layout(
+        template="plotly_dark",
+        height=650,
+        title_font=dict(size=18, color="#f1f5f9", family="Inter"),
+        margin=dict(l=20, r=40, t=60, b=40),
+        showlegend=False,
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        yaxis=dict(tickfont=dict(size=10)),
+        xaxis=dict(
+            gridcolor="rgba(148, 163, 184, 0.1)",
+            range=[0, max_val * 1.25],
+        ),
+    )
+
+    return fig
+
+
+# Where a sector's sales go: label, node colour and link colour, as in the single-sector overview.
+SALES_SPLIT = {
+    "exports": ("Exports", "#fb923c", "rgba(251, 146, 60, 0.45)"),
+    "consumer_sales": ("Consumer Sales", "#34d399", "rgba(52, 211, 153, 0.45)"),
+    "b2b_sales": ("B2B Sales (Raw Material)", "#a78bfa", "rgba(167, 139, 250, 0.45)"),
+    "capex_opex": ("CAPEX/OPEX", "#a855f7", "rgba(168, 85, 247, 0.45)"),
+}
+IMPORTS_COLOR = "#60a5fa"
+
+
+def _sector_names(sectors, width=40):
+    """Shortens sector names for axis and node labels: "Manufacture of food products" -> "Food products"."""
+    names = pd.Series(sectors, dtype=object).str.removeprefix("Manufacture of ")
+    return truncate_labels(names.str[:1].str.upper() + names.str[1:], width)
+
+
+def create_all_sectors_sankey(matrix, year=SUT_YEAR):
+    """Creates one Sankey of every sector: imports flow into each sector, whose sales split into its four uses.
+
+    ``matrix`` is ``DashboardEngine.sector_matrix``; all nodes and links come from its array at once.
+    """
+    n_sectors, n_uses = len(matrix), len(SALES_SPLIT)
+    uses = matrix[list(SALES_SPLIT)].to_numpy(dtype=float)
+    imports = matrix["imports"].to_numpy(dtype=float)
+    sales = matrix["sales"].to_numpy(dtype=float)
+    use_totals = uses.sum(axis=0)
+
+    # Node order: the imports source, then every sector, then the four uses.
+    sector_nodes = 1 + np.arange(n_sectors)
+    use_nodes = 1 + n_sectors + np.arange(n_uses)
+    use_names, use_colors, use_link_colors = (np.array(field, dtype=object) for field in zip(*SALES_SPLIT.values()))
+    node_labels = np.concatenate([
+        [f"<b>Imports</b><br>{format_value(imports.sum())}"],
+        "<b>" + _sector_names(matrix.index) + "</b><br>" + format_amount(sales),
+        "<b>" + use_names + "</b><br>" + format_amount(use_totals) + "<br>(" + format_percent(use_totals, sales.sum()) + ")",
+    ]).tolist()
+    node_colors = [IMPORTS_COLOR] + ["#3b82f6"] * n_sectors + use_colors.tolist()
+
+    link_source = np.concatenate([np.zeros(n_sectors, dtype=int), np.repeat(sector_nodes, n_uses)])
+    link_target = np.concatenate([sector_nodes, np.tile(use_nodes, n_sectors)])
+    link_value = np.concatenate([imports, uses.ravel()])
+    link_color = np.concatenate([np.full(n_sectors, "rgba(96, 165, 250, 0.35)", dtype=object), np.tile(use_link_colors, n_sectors)])
+    shown = link_value > 0
+
+    fig = go.Figure(data=[go.Sankey(
+        arrangement="snap",
+        node=dict(
+            pad=12,
+            thickness=20,
+            line=dict(color="rgba(255,255,255,0.2)", width=1),
+            label=node_labels,
+            color=node_colors,
+            hovertemplate='%{label}<extra></extra>'
+        ),
+        link=dict(
+            source=link_source[shown],
+            target=link_target[shown],
+            value=link_value[shown],
+            color=link_color[shown],
+            hovertemplate="Flow: %{value:,.0f} SR<extra></extra>"
+        )
+    )])
+
+    fig.update_layout(
+        template="plotly_dark",
+        title=dict(
+            text=f"Economic Flows Across All Sectors — imports {year}",
+            font=dict(size=20, color="#f1f5f9", family="Inter")
+        ),
+        font=dict(size=11, family="Inter"),
+        height=max(700, 36 * n_sectors),
+        margin=dict(l=20, r=20, t=80, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)"
+    )
+    return fig
+
+
+def create_sector_matrix_chart(matrix, year=SUT_YEAR):
+    """Creates stacked horizontal bars of every sector's sales by use, with its imports marked alongside."""
+    names = _sector_names(matrix.index)[::-1]
+    sales = matrix["sales"].to_numpy(dtype=float)[::-1]
+    fig = go.Figure()
+    for column, (label, color, _) in SALES_SPLIT.items():
+        values = matrix[column].to_numpy(dtype=float)[::-1]
+        fig.add_trace(go.Bar(
+            y=names, x=values, name=label, orientation="h", marker_color=color,
+            customdata=np.column_stack([format_amount(values), format_percent(values, sales)]),
+            hovertemplate="<b>%{y}</b><br>" + label + ": %{customdata[0]} (%{customdata[1]} of sales)<extra></extra>",
+        ))
+    imports = matrix["imports"].to_numpy(dtype=float)[::-1]
+    fig.add_trace(go.Scatter(
+        y=names, x=imports, name=f"Imports {year}", mode="markers",
+        marker=dict(symbol="diamond", size=11, color=IMPORTS_COLOR, line=dict(color="#f1f5f9", width=1)),
+        customdata=format_amount(imports),
+        hovertemplate="<b>%{y}</b><br>Imports: %{customdata}<extra></extra>",
+    ))
+
+    fig.update_layout(
+        barmode="stack",
+        template="plotly_dark",
+        title=dict(text="Sales by Use and Imports — All Sectors", font=dict(size=18, color="#f1f5f9", family="Inter")),
+        height=max(600, 32 * len(matrix)),
+        margin=dict(l=20, r=40, t=80, b=40),
+        legend=dict(orientation="h", y=1.02, x=0),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        xaxis=dict(gridcolor="rgba(148, 163, 184, 0.1)", title="SR"),
+        yaxis=dict(tickfont=dict(size=10)),
+    )
+    return fig
+
+
+BAR_TITLES = {"Exports": "Top Exported Commodities", "Imports": "Top Imported Commodities"}
+FLOW_COLORS = {"Exports": "rgba(251, 146, 60, 0.7)", "Imports": "rgba(96, 165, 250, 0.7)"}
+
+
+def sector_overview(selected_sector, summary, io_model=None, chain_options=None):
+    """Builds the overview Sankey from a sector summary, expanding B2B sales when chain_options is given.
+
+    ``chain_options`` is ``(tiers, top_k, min_share_percent)`` as chosen in the dashboard.
+    """
+    supply_chain = None
+    if chain_options is not None:
+        tiers, top_k, min_share = chain_options
+        supply_chain = supply_chain_flows(io_model, summary["isic_code"], tiers=tiers, top_k=top_k, min_share=min_share / 100)
+    return create_multilevel_sankey(selected_sector, summary["totals"], supply_chain)
+
+
+def flow_bar_chart(selected_sector, df, flow_type, year=SUT_YEAR, lang=DEFAULT_LANGUAGE):
+    """Builds the top-commodities bar chart for one flow of a sector."""
+    return create_bar_chart(df, f"{BAR_TITLES[flow_type]} — {selected_sector}", year, lang)
+
+
+def flow_heatmap(df_flow, flow_type, year=SUT_YEAR, page=0, lang=DEFAULT_LANGUAGE):
+    """Builds one page of the remaining-items heatmap for a flow, or None when there are no remaining items."""
+    other_df = split_top(df_flow)[1]
+    if other_df.empty:
+        return None
+    total_flow = df_flow[year].sum()
+    return create_other_items_heatmap(other_df, total_flow, flow_type, FLOW_COLORS[flow_type], year, page, lang=lang)
+
+
+def hs_flow_sankey(selected_sector, groups, flow_type, year=SUT_YEAR, parent=None):
+    """Builds the drill-down Sankey of the HS groups below parent, from ``DashboardEngine.hs_breakdown`` rows."""
+    digits = 2 if parent is None else len(parent) + 2
+    unit = HS_LEVELS[digits].lower() + "s" if digits in HS_LEVELS else "items"
+    # Groups read "HS 27 (43 items, largest: ...)"; commodities below a subheading "HS <code> · <name>".
+    labels = " (" + groups["label"] + ")" if digits in HS_LEVELS else " · " + groups["label"]
+    df = pd.DataFrame({COMMODITY_NAME[DEFAULT_LANGUAGE]: "HS " + groups["code"] + labels, year: groups["value"]})
+    title = selected_sector if parent is None else f"{selected_sector} › HS {parent}"
+    return create_expanded_flow_sankey(title, df, flow_type, year, unit)
@@ -0,0 +1,62 @@
+import numpy as np
+
+from hs_rollup import hs_code_strings
+from labels import COMMODITY_NAME, DEFAULT_LANGUAGE
+from time_series import year_columns
+
+SEARCH_COLUMNS = list(COMMODITY_NAME.values())
+CODE_COLUMN = "COMMODTIY_CODE"
+METRIC_COLUMNS = ["Growth", "Share", "Sector Share", "Rank"]
+DEFAULT_PAGE_ROWS = 100
+
+
+def default_columns(df, lang=DEFAULT_LANGUAGE):
+    """Returns the columns shown before the user picks any: code, name in lang, every year and the year's metrics."""
+    return [CODE_COLUMN, COMMODITY_NAME[lang]] + year_columns(df) + [c for c in METRIC_COLUMNS if c in df.columns]
+
+
+def sortable_columns(df):
+    """Returns the numeric columns a table can be sorted by: every year and the growth, share and rank columns."""
+    return year_columns(df) + [c for c in METRIC_COLUMNS if c in df.columns]
+
+
+def filter_rows(df, text):
+    """Returns the rows whose English or Arabic name contains text (case-insensitive) or whose HS code starts with it.
+
+    Codes are matched in their 8-digit zero-padded form, so "0101" finds chapter 01 only.
+    """
+    text = text.strip()
+    if not text:
+        return df
+    matched = np.zeros(len(df), dtype=bool)
+    for column in SEARCH_COLUMNS:
+        matched |= df[column].astype(str).str.contains(text, case=False, regex=False).to_numpy()
+    if text.isdigit():
+        matched |= np.char.startswith(hs_code_strings(df[CODE_COLUMN]).astype(str), text)
+    return df[matched]
+
+
+def sort_rows(df, column, descending=True):
+    """Returns the rows ordered by a numeric column, missing values last in either direction."""
+    values = df[column].to_numpy(dtype=float)
+    keys = -values if descending else values
+    order = np.argsort(np.where(np.isnan(keys), np.inf, keys), kind="stable")
+    return df.iloc[order]
+
+
+def query_rows(df, sort_by=None, descending=True, text=""):
+    """Filters and sorts a sector's commodity rows server-side.
+
+    ``df`` is a frame from ``SectorIndex.get``, already sorted by its year descending;
+    ``sort_by=None`` keeps that order without re-sorting.
+    """
+    rows = filter_rows(df, text)
+    if sort_by is not None:
+        rows = sort_rows(rows, sort_by, descending)
+    return rows
+
+
+def page_rows(rows, columns=None, page=0, rows_per_page=DEFAULT_PAGE_ROWS):
+    """Returns one page of rows, projected to columns (all columns by default)."""
+    start = page * rows_per_page
+    return rows.iloc[start:start + rows_per_page][columns or list(rows.columns)]
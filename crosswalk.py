@@ -0,0 +1,65 @@
+import pandas as pd
+
+from datastore import read_cleaned_data
+
+SUT_CODE_COLUMN = "Input-Output Table at Current Prices 2023 - Code"
+SUT_LABEL_COLUMN = "Input-Output Tables (IOTs) 2018 (Thousands of Saudi riyals) - Economic Activities (ISIC Rev. 4)"
+
+
+def sut_codes(sut_io):
+    """Returns the two-digit ISIC division code of each SUT/IO row, <NA> for primary-input rows."""
+    return pd.to_numeric(sut_io[SUT_CODE_COLUMN], errors="coerce").astype("Int64")
+
+
+def trade_codes(df):
+    """Returns the ISIC division code of each trade row as a nullable integer."""
+    return pd.to_numeric(df["CC_CODE"], errors="coerce").round().astype("Int64")
+
+
+def _trade_names(df, source):
+    """Returns one English sector name per ISIC code found in a trade table."""
+    names = pd.DataFrame({"isic_code": trade_codes(df), "trade_name": df["CC_DESC_EN"]}).dropna()
+    names = names.drop_duplicates("isic_code").set_index("isic_code")
+    names[f"in_{source}"] = True
+    return names
+
+
+def build_crosswalk(imports, exports, sut_io):
+    """Maps every ISIC division code seen in the trade or SUT/IO tables to its names and SUT row."""
+    codes = sut_codes(sut_io)
+    sut = pd.DataFrame({
+        "sut_name": sut_io[SUT_LABEL_COLUMN].to_numpy(),
+        "sut_row": range(len(sut_io)),
+    }, index=pd.Index(codes, name="isic_code"))
+    sut = sut[sut.index.notna()]
+    sut = sut[~sut.index.duplicated()]
+
+    imp = _trade_names(imports, "imports")
+    exp = _trade_names(exports, "exports")
+    trade = imp.combine_first(exp)
+
+    table = trade.join(sut, how="outer")
+    for flag in ("in_imports", "in_exports"):
+        table[flag] = table[flag].astype("boolean").fillna(False).astype(bool)
+    table["in_sut"] = table["sut_row"].notna()
+    table["sut_row"] = table["sut_row"].astype("Int64")
+    table["name_match"] = (
+        table["trade_name"].str.casefold().str.strip() == table["sut_name"].str.casefold().str.strip()
+    ).fillna(False).astype(bool)
+    return table.sort_index()
+
+
+def mismatch_report(crosswalk):
+    """Lists trade sector codes that cannot be joined cleanly: missing from SUT/IO or named differently."""
+    in_trade = crosswalk["in_imports"] | crosswalk["in_exports"]
+    report = crosswalk.assign(issue="")
+    report.loc[in_trade & ~crosswalk["in_sut"], "issue"] = "missing from SUT/IO"
+    report.loc[in_trade & crosswalk["in_sut"] & ~crosswalk["name_match"], "issue"] = "name differs"
+    return report.loc[report["issue"] != "", ["trade_name", "sut_name", "issue"]]
+
+
+if __name__ == "__main__":
+    imports, exports, sut_io = read_cleaned_data()
+    report = mismatch_report(build_crosswalk(imports, exports, sut_io))
+    with pd.option_context("display.max_rows", None, "display.max_colwidth", 60, "display.width", 200):
+        print(report)
@@ -0,0 +1,408 @@
+import hashlib
+import json
+import os
+import warnings
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from time_series import YEAR_PATTERN
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = feather = ipc = None
+
+CLEANED_DATA_DIR = "cleaned_data"
+IMPORTS_CSV = os.path.join(CLEANED_DATA_DIR, "cleaned_imports.csv")
+EXPORTS_CSV = os.path.join(CLEANED_DATA_DIR, "cleaned_exports.csv")
+SUT_IO_CSV = os.path.join(CLEANED_DATA_DIR, "sut_io_cleaned_data.csv")
+DATA_FILES = (IMPORTS_CSV, EXPORTS_CSV, SUT_IO_CSV)
+
+DATA_VERSION_FILE = os.path.join(CLEANED_DATA_DIR, "data_version.json")
+
+STORE_DIR = os.path.join(CLEANED_DATA_DIR, "store")
+STORE_TABLES = ("imports", "exports", "sut_io")
+# Bump when the layout of store files changes so existing tables are rewritten.
+STORE_FORMAT = 2
+
+# Fixed trade columns; every four-digit year column is float64 as well, whichever years a sheet has.
+TRADE_SCHEMA = {
+    "CT_TYPE": "category",
+    "CC_CODE": "int16",
+    "CC_DESC_AR": "category",
+    "CC_DESC_EN": "category",
+    "COMMODTIY_TYPE": "category",
+    "COMMODTIY_CODE": "int32",
+    "COMM_NAME_AR": "category",
+    "COMM_NAME_EN": "category",
+    "Growth": "float64",
+    "Share": "float64",
+}
+
+SUT_TEXT_COLUMNS = (
+    "Input-Output Table at Current Prices 2023 - Code",
+    "Input-Output Tables (IOTs) 2018 (Thousands of Saudi riyals) - Economic Activities (ISIC Rev. 4)",
+)
+
+
+def source_fingerprint(paths=DATA_FILES):
+    """Returns a cheap size/mtime fingerprint of the cleaned data files."""
+    digest = hashlib.sha1()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            digest.update(f"{path}:missing".encode())
+            continue
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:12]
+
+
+def read_version_stamp(path=DATA_VERSION_FILE):
+    """Returns the data-version stamp written by the ETL pipeline, or None."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def data_version():
+    """Returns the cache key for everything derived from the data files.
+
+    This is the content-hash stamp recorded by ``pipeline.py`` while the cleaned files
+    are the ones it wrote, and the size/mtime fingerprint of the files otherwise.
+    """
+    fingerprint = source_fingerprint()
+    stamp = read_version_stamp()
+    if stamp and stamp.get("source_fingerprint") == fingerprint:
+        return stamp["version"]
+    return fingerprint
+
+
+@contextmanager
+def atomic_path(path):
+    """Yields a temporary path next to ``path`` and moves it into place only if the block succeeds."""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json_atomic(data, path):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+
+def trade_dtype(column):
+    """Returns the store dtype of a trade column, or None for columns the store does not keep."""
+    if column in TRADE_SCHEMA:
+        return TRADE_SCHEMA[column]
+    return "float64" if YEAR_PATTERN.match(str(column)) else None
+
+
+def apply_trade_schema(df):
+    """Casts a trade table to the store schema: categorical names, integer codes, float64 years."""
+    df = df.copy()
+    for column in df.columns:
+        dtype = trade_dtype(column)
+        if dtype is None:
+            continue
+        if dtype.startswith("int"):
+            df[column] = pd.to_numeric(df[column], errors="coerce").round().astype(dtype)
+        elif dtype == "float64":
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(dtype)
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+
+def apply_sut_schema(df):
+    """Casts every SUT/IO column except the code and label columns to float64."""
+    df = df.copy()
+    for column in df.columns:
+        if column not in SUT_TEXT_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+    return df
+
+
+def read_csv_data():
+    """Reads the cleaned CSVs and applies the store schema."""
+    imports = apply_trade_schema(pd.read_csv(IMPORTS_CSV))
+    exports = apply_trade_schema(pd.read_csv(EXPORTS_CSV))
+    sut_io = apply_sut_schema(pd.read_csv(SUT_IO_CSV, dtype={SUT_TEXT_COLUMNS[0]: str}))
+    return imports, exports, sut_io
+
+
+def _numpy_buffers(df):
+    """Returns every NumPy buffer behind a frame's columns, with the arrays they are views of.
+
+    This reads pandas internals (blocks and extension-array attributes), so it raises
+    TypeError rather than silently missing buffers when a pandas release moves them.
+    """
+    blocks = getattr(getattr(df, "_mgr", None), "blocks", None)
+    if blocks is None:
+        raise TypeError(f"pandas {pd.__version__} frames have no _mgr.blocks")
+    buffers = []
+    for block in blocks:
+        values = block.values
+        if isinstance(values, np.ndarray):
+            found = [values]
+        elif hasattr(values, "_pa_array"):
+            # Arrow-backed arrays (the default string dtype) are immutable already.
+            found = []
+        else:
+            # Categorical codes live in _ndarray, nullable dtypes in _data and _mask.
+            found = [getattr(values, name) for name in ("_ndarray", "_data", "_mask")
+                     if isinstance(getattr(values, name, None), np.ndarray)]
+            if not found:
+                raise TypeError(f"pandas {pd.__version__} keeps the data of {type(values).__name__} "
+                                "somewhere freeze_frame does not look")
+        for buffer in found:
+            while isinstance(buffer, np.ndarray):
+                buffers.append(buffer)
+                buffer = buffer.base
+    return buffers
+
+
+def freeze_frame(df, copy=True):
+    """Returns a read-only frame the engine owns, with every NumPy buffer (categorical codes included) frozen.
+
+    A frame that is already read-only throughout, such as one read zero-copy from Arrow,
+    is returned as is. Otherwise it is deep-copied first, so the caller's frame stays
+    writable; ``copy=False`` freezes in place, for frames built only from the engine's own.
+    Writing into a frozen buffer raises instead of changing data every session shares.
+
+    Freezing is a safeguard only: on a pandas layout it does not know, it warns and returns
+    the frame unfrozen rather than fail.
+    """
+    try:
+        buffers = _numpy_buffers(df)
+    except (AttributeError, TypeError) as error:
+        warnings.warn(f"frame left writable: {error}", RuntimeWarning, stacklevel=2)
+        return df
+    if not any(buffer.flags.writeable for buffer in buffers):
+        return df
+    if copy:
+        df = df.copy()
+        buffers = _numpy_buffers(df)
+    for buffer in buffers:
+        buffer.flags.writeable = False
+    return df
+
+
+def arrow_table(frame):
+    """Converts a frame for an uncompressed Arrow file that reads back zero-copy.
+
+    pyarrow stores NaN in float columns as nulls, and a column with nulls must be copied
+    to become NaN again on the way back; storing NaN as a plain value avoids that.
+    """
+    table = pa.Table.from_pandas(frame)
+    for position, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type) and table.column(position).null_count:
+            table = table.set_column(position, field, pa.array(frame[field.name].to_numpy(), from_pandas=False))
+    return table
+
+
+def write_arrow(table, path):
+    """Writes an Arrow table as one uncompressed record batch, so every column maps back as one buffer."""
+    with atomic_path(path) as tmp_path:
+        feather.write_feather(table, tmp_path, compression="uncompressed", chunksize=max(table.num_rows, 1))
+
+
+def read_frame(path):
+    """Reads a frame memory-mapped: columns that convert zero-copy stay views of the page cache, shared by every process."""
+    frame = feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+    # The remaining columns were converted into fresh arrays nothing else holds, so they can be frozen in place.
+    return freeze_frame(frame, copy=False)
+
+
+STORE_SOURCES = dict(zip(STORE_TABLES, DATA_FILES))
+
+
+def _store_path(table, store_dir=STORE_DIR):
+    return os.path.join(store_dir, f"{table}.feather")
+
+
+def _read_manifest(store_dir=STORE_DIR):
+    try:
+        with open(os.path.join(store_dir, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def stale_store_tables(store_dir=STORE_DIR):
+    """Returns the store tables that are missing or were not written from the current CSV."""
+    tables = _read_manifest(store_dir).get("tables", {})
+    return [
+        table for table in STORE_TABLES
+        if not os.path.exists(_store_path(table, store_dir))
+        or tables.get(table, {}).get("source") != source_fingerprint([STORE_SOURCES[table]])
+        or tables.get(table, {}).get("format") != STORE_FORMAT
+    ]
+
+
+def store_is_current(store_dir=STORE_DIR):
+    """Returns True when every store table exists and was built from the current CSVs."""
+    return feather is not None and not stale_store_tables(store_dir)
+
+
+def write_store_table(table, df, store_dir=STORE_DIR):
+    """Writes one whole table to the store, laid out to be memory-mapped zero-copy."""
+    os.makedirs(store_dir, exist_ok=True)
+    write_arrow(arrow_table(df), _store_path(table, store_dir))
+
+
+def _arrow_type(dtype):
+    if dtype == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def _code_type(categories):
+    """Returns the Arrow type of the codes pandas keeps for that many categories, so they convert without a copy."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if categories < np.iinfo(dtype).max:
+            return pa.from_numpy_dtype(dtype)
+    return pa.int64()
+
+
+class StoreTableWriter:
+    """Appends typed trade chunks to one store table without holding the whole table in memory.
+
+    Chunks are streamed to a scratch file as Arrow batches, categorical columns as
+    dictionaries whose deltas each chunk carries. When the ``with`` block exits cleanly
+    the scratch file is rewritten into the store as one batch with sorted dictionaries,
+    the layout ``read_store`` maps zero-copy; only that Arrow table is ever held whole.
+    """
+
+    def __init__(self, table, columns, store_dir=STORE_DIR):
+        os.makedirs(store_dir, exist_ok=True)
+        self.columns = [column for column in columns if trade_dtype(column) is not None]
+        self.rows = 0
+        self._schema = pa.schema([(column, _arrow_type(trade_dtype(column))) for column in self.columns])
+        self._values = {column: [] for column in self.columns if trade_dtype(column) == "category"}
+        self._lookup = {column: {} for column in self._values}
+        self._path = _store_path(table, store_dir)
+        self._chunks_path = f"{self._path}.chunks-{os.getpid()}"
+        self._writer = None
+
+    def __enter__(self):
+        options = ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        self._writer = ipc.new_file(self._chunks_path, self._schema, options=options)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._writer.close()
+        try:
+            if exc_type is None:
+                self._write_table()
+        finally:
+            os.remove(self._chunks_path)
+
+    def _write_table(self):
+        chunks = ipc.open_file(pa.memory_map(self._chunks_path)).read_all()
+        arrays = []
+        for field in self._schema:
+            column = chunks.column(field.name)
+            if field.name not in self._values:
+                arrays.append(column.combine_chunks())
+                continue
+            # Chunk indices point into the cumulative dictionary; renumber them in sorted order, as the CSV path has.
+            values = np.array(self._values[field.name], dtype=object)
+            order = np.argsort(values, kind="stable")
+            rank = np.empty(len(order), dtype=np.int32)
+            rank[order] = np.arange(len(order), dtype=np.int32)
+            indices = pa.chunked_array([chunk.indices for chunk in column.chunks], pa.int32()).combine_chunks()
+            indices = pa.array(rank).take(indices).cast(_code_type(len(values)))
+            arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(values[order], pa.string())))
+        write_arrow(pa.Table.from_arrays(arrays, names=self.columns), self._path)
+
+    def _dictionary_array(self, column, series):
+        codes, uniques = pd.factorize(series.astype(object))
+        lookup, values = self._lookup[column], self._values[column]
+        for value in uniques:
+            if value not in lookup:
+                lookup[value] = len(values)
+                values.append(value)
+        global_ids = np.array([lookup[value] for value in uniques], dtype=np.int32)
+        missing = codes < 0
+        indices = np.zeros(len(codes), dtype=np.int32)
+        indices[~missing] = global_ids[codes[~missing]]
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32(), mask=missing), pa.array(values, pa.string()))
+
+    def write(self, chunk):
+        """Appends a chunk already cast with ``apply_trade_schema``."""
+        arrays = []
+        for field in self._schema:
+            if field.name in self._values:
+                arrays.append(self._dictionary_array(field.name, chunk[field.name]))
+            elif pa.types.is_floating(field.type):
+                # NaN stays a value, as in arrow_table, so the column reads back zero-copy.
+                arrays.append(pa.array(chunk[field.name].to_numpy(), type=field.type, from_pandas=False))
+            else:
+                arrays.append(pa.Array.from_pandas(chunk[field.name], type=field.type))
+        self._writer.write_batch(pa.record_batch(arrays, schema=self._schema))
+        self.rows += len(chunk)
+
+
+def write_store_manifest(store_dir=STORE_DIR):
+    """Records the size of each store table and the CSV fingerprint it corresponds to; written last."""
+    manifest = {"tables": {}}
+    for table in STORE_TABLES:
+        path = _store_path(table, store_dir)
+        if not os.path.exists(path):
+            continue
+        arrow_table = feather.read_table(path, memory_map=True)
+        manifest["tables"][table] = {
+            "rows": arrow_table.num_rows,
+            "columns": arrow_table.num_columns,
+            "source": source_fingerprint([STORE_SOURCES[table]]),
+            "format": STORE_FORMAT,
+        }
+    write_json_atomic(manifest, os.path.join(store_dir, "manifest.json"))
+    return manifest
+
+
+def build_store(tables=STORE_TABLES, store_dir=STORE_DIR):
+    """Writes the typed columnar store from the CSVs, then the manifest.
+
+    Each file is written to a temporary name and renamed into place, and the manifest
+    goes last, so readers never see a half-written store as current.
+    """
+    if feather is None:
+        raise RuntimeError("pyarrow is required to build the columnar store")
+    frames = dict(zip(STORE_TABLES, read_csv_data()))
+    for table in tables:
+        write_store_table(table, frames[table], store_dir)
+    return write_store_manifest(store_dir)
+
+
+def read_store(store_dir=STORE_DIR):
+    """Reads the columnar store and returns imports, exports and the supply-use table.
+
+    The files are memory-mapped zero-copy (see ``read_frame``): numeric columns and
+    categorical codes stay views of the page cache, shared by every process reading the
+    store, and the frames come back read-only.
+    """
+    return tuple(read_frame(_store_path(table, store_dir)) for table in STORE_TABLES)
+
+
+def read_cleaned_data():
+    """Reads imports, exports and the supply-use table, preferring the columnar store over CSV."""
+    if store_is_current():
+        return read_store()
+    return read_csv_data()
+
+
+if __name__ == "__main__":
+    print(json.dumps(build_store(), indent=2))
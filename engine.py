@@ -0,0 +1,313 @@
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from datastore import data_version, freeze_frame, read_cleaned_data
+from hs_rollup import CODE_COLUMN, HSRollup, hs_code_strings, hs_prefix
+from io_engine import build_io_model
+from labels import COMMODITY_NAME, DEFAULT_LANGUAGE, sector_name_map
+from search_index import CommoditySearchIndex
+from sector_metrics import build_sector_metrics
+from time_series import available_years, build_trade_long, year_view
+from trade_index import SectorIndex
+
+FLOW_TYPES = ("Exports", "Imports")
+# Year of the SUT/IO table; trade years are selectable, the demand side is not.
+SUT_YEAR = "2023"
+TOP_ITEMS = 10
+
+# Sectors offered on the dashboard's landing page, by trade or SUT name.
+DASHBOARD_SECTORS = [
+    "Manufacture of coke and refined petroleum products",
+    "Manufacture of food products",
+    "Manufacture of chemicals and chemical products",
+    "Manufacture of motor vehicles, trailers and semi-trailers",
+    "Manufacture of machinery and equipment n.e.c.",
+    "Manufacture of electrical equipment",
+    "Manufacture of basic metals",
+    "Manufacture of computer, electronic and optical products",
+    "Manufacture of fabricated metal products, except machinery and equipment",
+    "Manufacture of other transport equipment",
+    "Manufacture of other non-metallic mineral products",
+    "Manufacture of wearing apparel",
+    "Manufacture of furniture",
+    "Manufacture of rubber and plastics products",
+    "Manufacture of basic pharmaceutical products and pharmaceutical preparations",
+    "Other manufacturing",
+    "Manufacture of beverages",
+    "Manufacture of paper and paper products",
+    "Manufacture of textiles",
+    "Printing and reproduction of recorded media",
+    "Manufacture of leather and related products",
+    "Manufacture of woods, wood products and cork, except furniture",
+]
+
+# Frames every engine holds from construction; state() adds the derived ones built so far.
+BASE_FRAMES = ("imports", "exports", "sut_io", "metrics", "trade_long")
+
+# Sector summary fields in display order, mapped to their sector-metrics column.
+SUMMARY_FIELDS = {
+    "sales": "total_output",
+    "exports": "total_exports",
+    "imports": "imports_{year}",
+    "consumer_sales": "final_consumption",
+    "b2b_sales": "total_intermediate",
+    "capex_opex": "gross_capital_formation",
+}
+
+
+def frame_nbytes(df):
+    """Returns a frame's memory footprint in bytes, strings and categories included."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def split_top(df, n=TOP_ITEMS):
+    """Splits rows sorted by value descending into the top n and the remaining "Other" rows."""
+    return df.iloc[:n], df.iloc[n:]
+
+
+class DashboardEngine:
+    """Read-only query layer over one data version, shared by the dashboard and the HTTP API.
+
+    Sector metrics and the long trade table are built on construction; per-(flow, year)
+    sector indexes, the search index and the input-output model are built on first use.
+    Every frame is frozen, so one engine can be shared by all sessions without copies.
+
+    ``memory_budget`` (bytes) bounds the whole engine: past it, the least recently used
+    sector indexes are dropped and rebuilt on demand. ``on_memory`` is called with
+    ``memory_report()`` plus the keys just ``evicted`` whenever something is built or dropped.
+
+    ``metrics``, ``trade_long`` and ``hs_groups`` take frames computed earlier from the same
+    data (see ``state``) instead of computing them again.
+    """
+
+    def __init__(self, imports, exports, sut_io, version=None, memory_budget=None, on_memory=None,
+                 metrics=None, trade_long=None, hs_groups=None):
+        self.version = version
+        self.imports = freeze_frame(imports)
+        self.exports = freeze_frame(exports)
+        self.sut_io = freeze_frame(sut_io)
+        # Derived frames may share buffers with the caller's tables, so they are copied too.
+        self.metrics = freeze_frame(build_sector_metrics(imports, exports, sut_io) if metrics is None else metrics)
+        self.trade_long = freeze_frame(build_trade_long(imports, exports) if trade_long is None else trade_long)
+        self.years = available_years(self.trade_long)
+        self.memory_budget = memory_budget
+        self.on_memory = on_memory
+        self.evictions = 0
+        self._sizes = {name: frame_nbytes(getattr(self, name)) for name in BASE_FRAMES}
+        self._indexes = OrderedDict()
+        self._sector_names = {}
+        self._hs_groups = hs_groups
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, **options):
+        """Builds an engine over the current cleaned data."""
+        version = data_version()
+        return cls(*read_cleaned_data(), version=version, **options)
+
+    def state(self):
+        """Returns every frame the engine holds by name: the base frames, built sector indexes and HS groups."""
+        frames = {name: getattr(self, name) for name in BASE_FRAMES}
+        with self._lock:
+            frames.update({f"index:{flow}:{year}": index.frame for (flow, year), index in self._indexes.items()})
+        if "hs_rollup" in self.__dict__:
+            frames["hs_groups"] = self.hs_rollup.groups
+        return frames
+
+    @classmethod
+    def from_state(cls, frames, version=None, **options):
+        """Restores an engine from ``state()`` frames without recomputing any of them."""
+        engine = cls(*(frames[name] for name in BASE_FRAMES[:3]), version=version, metrics=frames["metrics"],
+                     trade_long=frames["trade_long"], hs_groups=frames.get("hs_groups"), **options)
+        for name, frame in frames.items():
+            if name.startswith("index:"):
+                _, flow_type, year = name.split(":")
+                with engine._lock:
+                    evicted = engine._add_index((flow_type, year), SectorIndex(freeze_frame(frame), year, presorted=True))
+                engine._notify(evicted)
+        return engine
+
+    @cached_property
+    def io_model(self):
+        model = build_io_model(self.sut_io)
+        self._track("io_model", sum(v.nbytes for v in vars(model).values() if isinstance(v, np.ndarray)))
+        return model
+
+    @cached_property
+    def search_index(self):
+        """Commodity search over both flows, with every year's value and the latest year's metrics."""
+        latest = self.years[-1]
+        docs = pd.concat(
+            [year_view(self.trade_long, flow, latest).assign(flow=flow) for flow in FLOW_TYPES], ignore_index=True
+        )
+        index = CommoditySearchIndex(docs)
+        self._track("search_index", index.nbytes)
+        return index
+
+    @cached_property
+    def hs_rollup(self):
+        rollup = HSRollup(self.trade_long, self._hs_groups)
+        self._track("hs_rollup", rollup.nbytes)
+        return rollup
+
+    @property
+    def sectors(self):
+        return list(self.metrics.index)
+
+    def dashboard_sectors(self):
+        """Returns the metrics rows of the landing-page sectors, largest total output first."""
+        metrics = self.metrics
+        on_display = metrics.index.isin(DASHBOARD_SECTORS) | metrics["sut_sector"].isin(DASHBOARD_SECTORS)
+        return metrics[on_display].sort_values("total_output", ascending=False, kind="stable")
+
+    def sector_matrix(self, year):
+        """Returns the landing-page sectors' summary totals for a year, one row per sector, largest sales first.
+
+        Columns follow ``SUMMARY_FIELDS``; the whole frame is one selection over the sector
+        metrics rather than a summary per sector.
+        """
+        if str(year) not in self.years:
+            raise KeyError(f"no trade data for {year}")
+        columns = [column.format(year=year) for column in SUMMARY_FIELDS.values()]
+        return self.dashboard_sectors()[columns].set_axis(list(SUMMARY_FIELDS), axis=1)
+
+    def sector_label(self, sector, lang=DEFAULT_LANGUAGE):
+        """Returns a sector's display name in lang; sectors are keyed by their English name."""
+        if lang == DEFAULT_LANGUAGE:
+            return sector
+        with self._lock:
+            names = self._sector_names.get(lang)
+            if names is None:
+                names = self._sector_names[lang] = sector_name_map(self.trade_long, lang)
+        return names.get(sector, sector)
+
+    @cached_property
+    def _sector_by_code(self):
+        codes = self.metrics["isic_code"]
+        first = ~codes.duplicated()
+        return dict(zip(codes[first].astype(int), self.metrics.index[first]))
+
+    def sector_for_code(self, code):
+        """Returns the trade sector name for an ISIC division code, or None."""
+        return self._sector_by_code.get(int(code))
+
+    def sector_index(self, flow_type, year):
+        """Returns the sector-partitioned index over one flow's rows for one year."""
+        if flow_type not in FLOW_TYPES:
+            raise KeyError(f"unknown flow type {flow_type!r}")
+        if str(year) not in self.years:
+            raise KeyError(f"no trade data for {year}")
+        key = (flow_type, str(year))
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+            index = SectorIndex(year_view(self.trade_long, flow_type, year), str(year))
+            # Built here from the engine's own trade_long, so it is frozen in place.
+            freeze_frame(index.frame, copy=False)
+            evicted = self._add_index(key, index)
+        self._notify(evicted)
+        return index
+
+    def _add_index(self, key, index):
+        """Holds a frozen sector index (the lock must be held) and returns the keys evicted to stay within budget."""
+        self._indexes[key] = index
+        self._sizes[key] = frame_nbytes(index.frame)
+        return self._evict_over_budget(keep=key)
+
+    def _track(self, name, nbytes):
+        with self._lock:
+            self._sizes[name] = nbytes
+            evicted = self._evict_over_budget()
+        self._notify(evicted)
+
+    def _evict_over_budget(self, keep=None):
+        """Drops least recently used sector indexes, never keep, until the engine fits its budget."""
+        evicted = []
+        if self.memory_budget is None:
+            return evicted
+        for key in list(self._indexes):
+            if sum(self._sizes.values()) <= self.memory_budget:
+                break
+            if key != keep:
+                del self._indexes[key]
+                del self._sizes[key]
+                evicted.append(key)
+        self.evictions += len(evicted)
+        return evicted
+
+    def _notify(self, evicted):
+        if self.on_memory is not None:
+            self.on_memory(dict(self.memory_report(), evicted=evicted))
+
+    def memory_report(self):
+        """Returns bytes held per component, their total, the budget and the eviction count."""
+        with self._lock:
+            components = {name if isinstance(name, str) else "index:" + ":".join(name): nbytes
+                          for name, nbytes in self._sizes.items()}
+        return {
+            "components": components,
+            "total": sum(components.values()),
+            "budget": self.memory_budget,
+            "evictions": self.evictions,
+        }
+
+    def sector_summary(self, sector, year):
+        """Returns a sector's sales, demand and trade totals for a year, each with its share of sales.
+
+        Raises KeyError for an unknown sector or year.
+        """
+        if str(year) not in self.years:
+            raise KeyError(f"no trade data for {year}")
+        row = self.metrics.loc[sector]
+        values = np.array([row[column.format(year=year)] for column in SUMMARY_FIELDS.values()], dtype=float)
+        sales = values[0]
+        shares = values / sales if sales > 0 else np.zeros_like(values)
+        return {
+            "sector": sector,
+            "isic_code": int(row["isic_code"]),
+            "sut_sector": row["sut_sector"] if isinstance(row["sut_sector"], str) else None,
+            "year": str(year),
+            "totals": dict(zip(SUMMARY_FIELDS, values.tolist())),
+            "share_of_sales": dict(zip(SUMMARY_FIELDS, shares.tolist())),
+        }
+
+    def flow_breakdown(self, sector, flow_type, year, top_n=TOP_ITEMS):
+        """Returns a sector's flow total, its top_n commodities and the aggregated remainder.
+
+        ``top`` and ``other`` are frames sorted by value descending.
+        """
+        df_flow = self.sector_index(flow_type, year).get(sector)
+        top, other = split_top(df_flow, top_n)
+        return {
+            "total": float(df_flow[str(year)].sum()),
+            "top": top,
+            "other": other,
+            "other_total": float(other[str(year)].sum()),
+        }
+
+    def hs_breakdown(self, sector, flow_type, year, parent=None, lang=DEFAULT_LANGUAGE):
+        """Returns a sector's flow one HS level below parent: chapters when None, commodities under a subheading.
+
+        Rows are largest first, with ``code``, ``label`` (in ``lang``), ``value`` and ``items`` columns.
+        """
+        if parent is None or len(parent) < 6:
+            self.sector_index(flow_type, year)  # validates the flow and year
+            return self.hs_rollup.children(flow_type, sector, year, parent, lang)
+        df_flow = self.sector_index(flow_type, year).get(sector)
+        rows = df_flow[hs_prefix(df_flow[CODE_COLUMN], 6) == int(parent)]
+        return pd.DataFrame({
+            "code": hs_code_strings(rows[CODE_COLUMN]),
+            "label": rows[COMMODITY_NAME[lang]].to_numpy(dtype=object),
+            "value": np.nan_to_num(rows[str(year)].to_numpy(dtype=float)),
+            "items": 1,
+        })
+
+    def top_commodities(self, sector, flow_type, year, n=15):
+        """Returns a sector's n largest commodities for a flow and year."""
+        return self.sector_index(flow_type, year).get(sector).head(n)
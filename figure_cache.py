@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+_NO_FIGURE = "null"
+
+
+def serialize_figure(fig):
+    """Returns a figure as the JSON string the cache stores; None (no figure) is stored too."""
+    return _NO_FIGURE if fig is None else pio.to_json(fig, validate=False)
+
+
+def deserialize_figure(payload):
+    """Returns the figure a cached JSON string holds, or None for a cached "no figure"."""
+    return None if payload == _NO_FIGURE else pio.from_json(payload)
+
+
+def figure_key(version, sector, view, flow_type, year, *variant):
+    """Returns the cache key of a dashboard figure; the publish manifest uses the same keys."""
+    return (version, sector, view, flow_type, year) + variant
+
+
+class FigureCache:
+    """Size-bounded LRU cache of serialized Plotly figures, safe to share across sessions.
+
+    Figures are stored as JSON strings so cached entries are immutable and a caller can
+    never mutate a figure another session is about to render.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get_json(self, key):
+        """Returns the cached JSON for a key (marking it recently used), or None on a miss."""
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put_json(self, key, payload):
+        """Stores a figure serialized with serialize_figure, evicting the least recently used entries."""
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return payload
+
+    def clear(self):
+        """Drops every entry; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns entry count and hit/miss/eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
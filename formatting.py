@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+# Largest first: each value takes the first scale its magnitude reaches.
+SCALES = ((1_000_000_000, "B"), (1_000_000, "M"), (1_000, "K"))
+
+
+def format_amount(values, prefix="SR ", decimals=2):
+    """Formats an array of amounts as labels like "SR 1.23B", "SR 4.56M", "SR 7.89K" or "SR 512".
+
+    Amounts under a thousand are shown as whole riyals and missing values as zero.
+    Returns an object array of str, so labels can be joined with ``+``.
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    magnitude = np.abs(values)
+    divisor = np.ones_like(values)
+    suffix = np.full(values.shape, "", dtype="<U1")
+    # A value that would round up to 1000 at one scale (999,999 -> "1000.00K") moves to the next.
+    step = 1.0
+    for threshold, letter in reversed(SCALES):
+        reached = magnitude >= threshold - step / 2
+        divisor[reached] = threshold
+        suffix[reached] = letter
+        step = threshold * 10.0 ** -decimals
+    scaled = np.char.mod(f"%.{decimals}f", values / divisor)
+    whole = np.char.mod("%.0f", values)
+    numbers = np.where(suffix == "", whole, scaled)
+    return np.char.add(np.char.add(prefix, numbers), suffix).astype(object)
+
+
+def format_percent(values, total, decimals=1):
+    """Formats each value as a percentage of total, e.g. "12.3%"; a zero total gives "0.0%".
+
+    ``total`` is a scalar or an array of per-value totals.
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    total = np.broadcast_to(np.asarray(total, dtype=float), values.shape)
+    percents = np.zeros_like(values)
+    np.divide(values * 100, total, out=percents, where=total != 0)
+    return np.char.add(np.char.mod(f"%.{decimals}f", percents), "%").astype(object)
+
+
+def format_value(value):
+    """Formats a single amount, e.g. format_value(2.5e9) == "SR 2.50B"."""
+    return format_amount(np.atleast_1d(value))[0]
+
+
+def truncate_labels(names, width):
+    """Shortens names longer than width characters to width - 3 characters plus "..."."""
+    names = pd.Series(names, dtype=object).astype(str)
+    return names.where(names.str.len() <= width, names.str[:width - 3] + "...").to_numpy(dtype=object)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+from labels import COMMODITY_NAME, DEFAULT_LANGUAGE
+from trade_index import SECTOR_COLUMN
+
+CODE_COLUMN = "COMMODTIY_CODE"
+HS_DIGITS = 8
+# Chapter, heading and subheading; 8-digit codes are the commodities themselves.
+HS_LEVELS = {2: "Chapter", 4: "Heading", 6: "Subheading"}
+GROUP_KEYS = ["flow", SECTOR_COLUMN, "year"]
+
+
+def hs_code_strings(codes, digits=HS_DIGITS):
+    """Returns integer HS codes as zero-padded strings (the source files drop leading zeros)."""
+    return pd.Series(codes).astype("int64").map(f"{{:0{digits}d}}".format).to_numpy(dtype=object)
+
+
+def group_label(items, largest):
+    """Labels an HS group by its size and largest commodity, so it does not read as that one commodity."""
+    return f"{items} items, largest: {largest}" if items > 1 else f"1 item: {largest}"
+
+
+def hs_prefix(codes, digits):
+    """Returns the leading digits of 8-digit integer HS codes, as integers."""
+    return np.asarray(codes, dtype="int64") // 10 ** (HS_DIGITS - digits)
+
+
+class HSRollup:
+    """Sector totals per HS chapter, heading and subheading, for every flow and year.
+
+    One groupby over the long trade table sums each 6-digit subheading; headings and
+    chapters are then summed from that far smaller result. The source files carry no HS
+    nomenclature, so each group is labelled by its item count and its largest commodity;
+    only the position of that commodity is stored, and names are looked up on query.
+
+    ``groups`` restores a rollup from the ``groups`` frame of one built over the same table.
+    """
+
+    def __init__(self, trade_long, groups=None):
+        self._names = {lang: trade_long[column] for lang, column in COMMODITY_NAME.items()}
+        self.groups = self._build_groups(trade_long) if groups is None else groups
+        self._slices = {
+            key: slice(positions[0], positions[-1] + 1)
+            for key, positions in self.groups.groupby(GROUP_KEYS + ["level"], observed=True, sort=False).indices.items()
+        }
+        self._empty = self.groups.iloc[0:0]
+
+    @classmethod
+    def _build_groups(cls, trade_long):
+        leaves = pd.DataFrame({
+            "flow": trade_long["flow"].to_numpy(),
+            SECTOR_COLUMN: trade_long[SECTOR_COLUMN].to_numpy(),
+            "year": trade_long["year"].to_numpy(),
+            "code": hs_prefix(trade_long[CODE_COLUMN], 6),
+            "value": np.nan_to_num(trade_long["value"].to_numpy(dtype=float)),
+            "row": np.arange(len(trade_long)),
+        })
+        levels = {6: cls._sum_groups(leaves.assign(top=leaves["value"]), 6, items=False)}
+        for digits in (4, 2):
+            finer = levels[digits + 2]
+            levels[digits] = cls._sum_groups(finer.assign(code=finer["code"] // 100), digits, items=True)
+
+        groups = pd.concat([levels[digits] for digits in HS_LEVELS], ignore_index=True)
+        groups["year"] = groups["year"].astype(str)
+        return groups.sort_values(GROUP_KEYS + ["level", "value"], ascending=[True] * 4 + [False],
+                                  kind="stable", ignore_index=True)
+
+    @staticmethod
+    def _sum_groups(rows, digits, items):
+        """Sums rows per (flow, sector, year, code), keeping the row of the group's largest commodity."""
+        rows = rows.sort_values("top", ascending=False, kind="stable")
+        grouped = rows.groupby(GROUP_KEYS + ["code"], observed=True, sort=False)
+        summed = grouped.agg(value=("value", "sum"), top=("top", "first"), row=("row", "first"))
+        summed["items"] = grouped["items"].sum() if items else grouped.size()
+        return summed.reset_index().assign(level=digits)
+
+    @property
+    def nbytes(self):
+        return int(self.groups.memory_usage(index=True, deep=True).sum())
+
+    def children(self, flow_type, sector, year, parent=None, lang=DEFAULT_LANGUAGE):
+        """Returns the groups one level below parent (chapters when None), largest first.
+
+        Columns are ``code`` (zero-padded), ``label`` (see ``group_label``, names in ``lang``),
+        ``value`` and ``items``, the number of commodities in the group.
+        """
+        digits = 2 if parent is None else len(parent) + 2
+        rows = self._slices.get((flow_type, sector, str(year), digits))
+        groups = self._empty if rows is None else self.groups.iloc[rows]
+        if parent is not None:
+            groups = groups[groups["code"].to_numpy() // 100 == int(parent)]
+        largest = self._names[lang].iloc[groups["row"].to_numpy()].to_numpy(dtype=object)
+        return pd.DataFrame({
+            "code": hs_code_strings(groups["code"], digits),
+            "label": [group_label(items, name) for items, name in zip(groups["items"].to_numpy(), largest)],
+            "value": groups["value"].to_numpy(),
+            "items": groups["items"].to_numpy(),
+        })
@@ -0,0 +1,125 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+
+class _NullTrace:
+    """Stands in for a trace when instrumentation is off, so call sites need no checks."""
+
+    def span(self, name):
+        return nullcontext()
+
+    def count(self, name, n=1):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+_current = contextvars.ContextVar("rerun_trace", default=NULL_TRACE)
+
+
+def current_trace():
+    """Returns the trace of the rerun running in this thread, or a no-op trace."""
+    return _current.get()
+
+
+class RerunTrace:
+    """Timing spans and counters for one rerun of the dashboard script.
+
+    Spans with the same name accumulate, so a span around each figure lookup adds up to
+    the rerun's total figure time.
+    """
+
+    def __init__(self, view, session=None):
+        self.view = view
+        self.session = session
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.spans = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[name] += time.perf_counter() - started
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def record(self):
+        """Returns the trace as a JSON-ready dict, with span times in milliseconds."""
+        spans = {name: seconds * 1000 for name, seconds in self.spans.items()}
+        spans["total"] = (time.perf_counter() - self._started) * 1000
+        return {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started_at)),
+            "view": self.view,
+            "session": self.session,
+            "spans_ms": spans,
+            "counters": dict(self.counters),
+        }
+
+
+class Tracer:
+    """Collects per-rerun traces: appends each to a JSON-lines log and keeps the latest for percentiles."""
+
+    def __init__(self, log_path=None, history=2000):
+        self.log_path = log_path
+        self._recent = deque(maxlen=history)
+        self._lock = threading.Lock()
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+
+    @contextmanager
+    def rerun(self, view, session=None):
+        """Makes a new trace current for the block and records it when the block exits, however it exits."""
+        trace = RerunTrace(view, session)
+        token = _current.set(trace)
+        try:
+            yield trace
+        finally:
+            _current.reset(token)
+            self.add(trace.record())
+
+    def add(self, record):
+        line = json.dumps(record)
+        with self._lock:
+            self._recent.append(record)
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+    def records(self):
+        with self._lock:
+            return list(self._recent)
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
+
+    def summary(self):
+        """Returns one row per (view, span) with the rerun count and p50/p95 milliseconds, slowest first."""
+        samples = defaultdict(list)
+        for record in self.records():
+            for span, ms in record["spans_ms"].items():
+                samples[(record["view"], span)].append(ms)
+        rows = []
+        for (view, span), values in samples.items():
+            p50, p95 = np.percentile(values, [50, 95])
+            rows.append({"view": view, "span": span, "reruns": len(values), "p50_ms": p50, "p95_ms": p95})
+        return sorted(rows, key=lambda row: (row["view"], -row["p95_ms"]))
+
+    def counter_totals(self):
+        """Returns every counter summed over the recent reruns."""
+        totals = defaultdict(int)
+        for record in self.records():
+            for name, n in record["counters"].items():
+                totals[name] += n
+        return dict(totals)
@@ -0,0 +1,189 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from crosswalk import SUT_LABEL_COLUMN, sut_codes
+from sector_metrics import SUT_UNIT
+
+DIVISION_COLUMN = re.compile(r"^(\d{2}) - ")
+TOTAL_OUTPUT_COLUMN = "Total Output"
+
+
+def _safe_divide(numerator, denominator):
+    """Divides element-wise, returning 0 where the denominator is 0."""
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator, dtype=float), where=denominator != 0)
+
+
+class IOModel:
+    """Leontief input-output model over the industry-by-industry block of the SUT/IO table.
+
+    All matrices are computed once on construction; queries are index lookups or a
+    single matrix-vector product. Values are in Saudi riyals.
+    """
+
+    def __init__(self, codes, names, Z, x):
+        self.codes = np.asarray(codes, dtype=int)
+        self.names = np.asarray(names, dtype=object)
+        self.Z = np.asarray(Z, dtype=float)
+        self.x = np.asarray(x, dtype=float)
+        self._position = {code: i for i, code in enumerate(self.codes)}
+
+        n = len(self.codes)
+        identity = np.eye(n)
+        # Technical coefficients: a_ij = z_ij / x_j (input from i per riyal of output of j).
+        self.A = _safe_divide(self.Z, self.x[np.newaxis, :])
+        self.L = np.linalg.inv(identity - self.A)
+        # Allocation coefficients for the supply-side (Ghosh) model used for forward linkages.
+        self.B = _safe_divide(self.Z, self.x[:, np.newaxis])
+        self.G = np.linalg.inv(identity - self.B)
+
+        self.output_multipliers = self.L.sum(axis=0)
+        self.backward_linkages = self.output_multipliers / self.output_multipliers.mean()
+        forward = self.G.sum(axis=1)
+        self.forward_linkages = forward / forward.mean()
+
+    def position(self, code):
+        """Returns the matrix position of an ISIC division code, or None if it is not in the table."""
+        return self._position.get(int(code)) if code is not None else None
+
+    def _series(self, values):
+        return pd.Series(values, index=pd.Index(self.codes, name="isic_code"))
+
+    def output_multiplier(self, code):
+        """Total output across the economy generated by one riyal of final demand for a sector."""
+        return float(self.output_multipliers[self.position(code)])
+
+    def backward_linkage(self, code):
+        """Normalised backward linkage; above 1 means the sector pulls more than average from suppliers."""
+        return float(self.backward_linkages[self.position(code)])
+
+    def forward_linkage(self, code):
+        """Normalised forward linkage; above 1 means the sector pushes more than average into buyers."""
+        return float(self.forward_linkages[self.position(code)])
+
+    def linkages(self):
+        """Returns multipliers and linkages for every sector as one frame."""
+        return pd.DataFrame({
+            "sector": self.names,
+            "output_multiplier": self.output_multipliers,
+            "backward_linkage": self.backward_linkages,
+            "forward_linkage": self.forward_linkages,
+        }, index=pd.Index(self.codes, name="isic_code"))
+
+    def demand_shock(self, shocks):
+        """Returns the change in each sector's output for a {isic_code: change in final demand} mapping."""
+        delta = np.zeros(len(self.codes))
+        for code, value in shocks.items():
+            position = self.position(code)
+            if position is None:
+                raise KeyError(f"ISIC code {code} is not in the input-output table")
+            delta[position] += value
+        return self._series(self.L @ delta)
+
+    def suppliers(self, code):
+        """Direct purchases of a sector from every supplying sector (column of Z)."""
+        return self._series(self.Z[:, self.position(code)])
+
+    def buyers(self, code):
+        """Direct sales of a sector to every purchasing sector (row of Z)."""
+        return self._series(self.Z[self.position(code), :])
+
+
+def build_io_model(sut_io):
+    """Extracts the transaction matrix and total output from the SUT/IO table and builds an IOModel."""
+    division_columns = [column for column in sut_io.columns if DIVISION_COLUMN.match(column)]
+    column_codes = [int(DIVISION_COLUMN.match(column).group(1)) for column in division_columns]
+
+    row_codes = sut_codes(sut_io)
+    industry_rows = sut_io[row_codes.notna().to_numpy()].set_index(row_codes.dropna().astype(int).to_numpy())
+    industry_rows = industry_rows.loc[column_codes]
+
+    Z = industry_rows[division_columns].apply(pd.to_numeric, errors="coerce").fillna(0.0).to_numpy() * SUT_UNIT
+    x = pd.to_numeric(industry_rows[TOTAL_OUTPUT_COLUMN], errors="coerce").fillna(0.0).to_numpy() * SUT_UNIT
+    return IOModel(column_codes, industry_rows[SUT_LABEL_COLUMN].to_numpy(), Z, x)
+
+
+def _prune(values, top_k, min_value):
+    """Returns positions of the largest values, at most top_k and none below min_value."""
+    order = np.argsort(values)[::-1][:top_k]
+    return order[values[order] >= max(min_value, np.finfo(float).tiny)]
+
+
+def supply_chain_flows(model, code, tiers=1, top_k=8, min_share=0.01):
+    """Traces where a sector's intermediate sales go, tier by tier, with pruning.
+
+    Tier 1 is the sector's row of Z (its sales to each purchasing industry). Tier 2
+    follows each kept tier-1 buyer's sales on pro rata, i.e. z_sj * b_jk where b is the
+    allocation-coefficient matrix. Each tier keeps at most ``top_k`` industries whose
+    flow is at least ``min_share`` of the sector's intermediate sales; the remainder is
+    merged into one "Other industries" node per tier.
+
+    Returns ``(nodes, links)``: ``nodes`` has columns tier, code, name, value (row 0 is
+    the sector itself, code -1 marks an "Other" node) and ``links`` has integer source
+    and target positions into ``nodes`` plus value and tier.
+    """
+    root = model.position(code)
+    if root is None:
+        raise KeyError(f"ISIC code {code} is not in the input-output table")
+
+    row = model.Z[root]
+    total = row.sum()
+    min_value = min_share * total
+
+    node_tier, node_code, node_name, node_value = [0], [model.codes[root]], [model.names[root]], [total]
+    link_source, link_target, link_value, link_tier = [], [], [], []
+
+    def add_nodes(tier, positions, values):
+        start = len(node_code)
+        node_tier.extend([tier] * len(positions))
+        node_code.extend(model.codes[positions])
+        node_name.extend(model.names[positions])
+        node_value.extend(values)
+        return start + np.arange(len(positions))
+
+    def add_other(tier, value):
+        node_tier.append(tier)
+        node_code.append(-1)
+        node_name.append("Other industries")
+        node_value.append(value)
+        return len(node_code) - 1
+
+    def add_links(tier, sources, targets, values):
+        link_source.append(np.asarray(sources))
+        link_target.append(np.asarray(targets))
+        link_value.append(np.asarray(values, dtype=float))
+        link_tier.append(np.full(len(values), tier))
+
+    kept = _prune(row, top_k, min_value)
+    kept_nodes = add_nodes(1, kept, row[kept])
+    add_links(1, np.zeros(len(kept), dtype=int), kept_nodes, row[kept])
+    other_value = total - row[kept].sum()
+    if other_value > 0 and other_value >= min_value:
+        add_links(1, [0], [add_other(1, other_value)], [other_value])
+
+    if tiers >= 2 and len(kept):
+        # flows[i, k]: riyals of the root sector's output passing from buyer kept[i] to industry k.
+        flows = row[kept][:, np.newaxis] * model.B[kept]
+        received = flows.sum(axis=0)
+        targets = _prune(received, top_k, min_value)
+        target_nodes = add_nodes(2, targets, received[targets])
+
+        sub = flows[:, targets]
+        src, dst = np.nonzero(sub >= np.finfo(float).tiny)
+        add_links(2, kept_nodes[src], target_nodes[dst], sub[src, dst])
+
+        other_flows = flows.sum(axis=1) - sub.sum(axis=1)
+        has_other = other_flows >= np.finfo(float).tiny
+        if has_other.any():
+            other_node = add_other(2, other_flows[has_other].sum())
+            add_links(2, kept_nodes[has_other], np.full(has_other.sum(), other_node), other_flows[has_other])
+
+    nodes = pd.DataFrame({"tier": node_tier, "code": node_code, "name": node_name, "value": node_value})
+    links = pd.DataFrame({
+        "source": np.concatenate(link_source),
+        "target": np.concatenate(link_target),
+        "value": np.concatenate(link_value),
+        "tier": np.concatenate(link_tier),
+    })
+    return nodes, links
@@ -0,0 +1,20 @@
+import numpy as np
+
+LANGUAGES = {"en": "English", "ar": "العربية"}
+DEFAULT_LANGUAGE = "en"
+
+# Name columns per language. Sectors and commodities are keyed by their English name
+# everywhere; the other language is looked up only for what is displayed.
+SECTOR_NAME = {"en": "CC_DESC_EN", "ar": "CC_DESC_AR"}
+COMMODITY_NAME = {"en": "COMM_NAME_EN", "ar": "COMM_NAME_AR"}
+
+
+def sector_name_map(trade_long, lang):
+    """Returns {English sector name: name in lang}, read from the categorical codes of the long trade table."""
+    english = trade_long[SECTOR_NAME[DEFAULT_LANGUAGE]]
+    localized = trade_long[SECTOR_NAME[lang]]
+    pairs = np.unique(np.column_stack([english.cat.codes, localized.cat.codes]), axis=0)
+    pairs = pairs[(pairs >= 0).all(axis=1)]
+    # A sector spelled more than one way in the other language keeps its first spelling.
+    first = np.unique(pairs[:, 0], return_index=True)[1]
+    return dict(zip(english.cat.categories[pairs[first, 0]], localized.cat.categories[pairs[first, 1]]))
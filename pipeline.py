@@ -0,0 +1,300 @@
+"""Incremental ETL from the source workbooks in data/ to the cleaned files the dashboard reads.
+
+Usage:
+    python pipeline.py              # run stages whose source sheets changed, then refresh the store
+    python pipeline.py --force      # rerun every stage
+    python pipeline.py --stage sut_io
+
+Each stage reads one worksheet. A stage is skipped when the content hash of its sheet
+(plus the workbook's shared strings) and the stage's code version match the last run
+recorded in cleaned_data/pipeline_state.json and its output file is still present.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import posixpath
+import sys
+import time
+import zipfile
+from contextlib import ExitStack
+from xml.etree import ElementTree
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from datastore import (
+    CLEANED_DATA_DIR,
+    DATA_VERSION_FILE,
+    EXPORTS_CSV,
+    IMPORTS_CSV,
+    SUT_IO_CSV,
+    StoreTableWriter,
+    apply_sut_schema,
+    apply_trade_schema,
+    atomic_path,
+    build_store,
+    feather,
+    source_fingerprint,
+    stale_store_tables,
+    trade_dtype,
+    write_json_atomic,
+    write_store_manifest,
+    write_store_table,
+)
+
+SOURCE_DIR = "data"
+TRADE_WORKBOOK = os.path.join(SOURCE_DIR, "Exports_Imports_by_ISIC_2023_2024.xlsx")
+SUT_WORKBOOK = os.path.join(SOURCE_DIR, "SUT and IO By Divisions -En.xlsx")
+STATE_FILE = os.path.join(CLEANED_DATA_DIR, "pipeline_state.json")
+
+# Bump when a stage's cleaning logic changes so existing outputs are rebuilt; run the
+# pipeline and commit the regenerated STATE_FILE with the bump, or every checkout reruns it.
+TRADE_STAGE_VERSION = 3
+SUT_STAGE_VERSION = 1
+
+# Trade sheets have five title rows above the header row.
+TRADE_HEADER_ROW = 5
+TRADE_CHUNK_ROWS = 50_000
+
+_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def file_hash(path):
+    """Returns the SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sheet_hash(path, sheet_name):
+    """Returns a SHA-256 over one worksheet's XML and the shared strings of an .xlsx workbook.
+
+    Falls back to hashing the whole file when the workbook cannot be read as a zip package.
+    """
+    try:
+        with zipfile.ZipFile(path) as package:
+            workbook = ElementTree.fromstring(package.read("xl/workbook.xml"))
+            rels = ElementTree.fromstring(package.read("xl/_rels/workbook.xml.rels"))
+            targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(f"{_PKG_REL_NS}Relationship")}
+            rel_id = next(
+                sheet.get(f"{_REL_NS}id")
+                for sheet in workbook.iter(f"{_MAIN_NS}sheet")
+                if sheet.get("name") == sheet_name
+            )
+            target = targets[rel_id]
+            part = target.lstrip("/") if target.startswith("/") else posixpath.join("xl", target)
+            digest = hashlib.sha256(package.read(part))
+            if "xl/sharedStrings.xml" in package.namelist():
+                digest.update(package.read("xl/sharedStrings.xml"))
+            return digest.hexdigest()
+    except (zipfile.BadZipFile, KeyError, StopIteration, ElementTree.ParseError):
+        return file_hash(path)
+
+
+def clean_columns(df):
+    """Normalises column names: strips, folds newlines and collapses whitespace."""
+    df.columns = (
+        df.columns.astype(str)
+        .str.strip()
+        .str.replace("\n", " ")
+        .str.replace(r"\s+", " ", regex=True)
+    )
+    return df
+
+
+def _clean_trade_chunk(rows, positions, columns):
+    """Builds a typed frame from raw sheet rows, dropping empty rows and rows without a sector or code."""
+    width = max(positions) + 1
+    padded = [tuple(row[:width]) + (None,) * (width - len(row)) for row in rows]
+    df = pd.DataFrame.from_records(padded, columns=range(width))[positions]
+    df.columns = columns
+    df = df.dropna(how="all")
+    required = ["CC_DESC_EN"] + [column for column in columns if trade_dtype(column).startswith("int")]
+    df = df.dropna(subset=[column for column in required if column in df.columns])
+    return apply_trade_schema(df)
+
+
+def iter_trade_chunks(workbook, sheet_name, chunk_rows=TRADE_CHUNK_ROWS):
+    """Streams one trade sheet in read-only mode and yields cleaned, typed chunks of at most chunk_rows rows.
+
+    Only columns named in the trade schema and four-digit year columns are kept, which
+    also drops the unnamed empty columns the sheets carry. Peak memory is one chunk, whatever the sheet size.
+    """
+    book = openpyxl.load_workbook(workbook, read_only=True, data_only=True)
+    try:
+        rows = book[sheet_name].iter_rows(values_only=True)
+        for _ in range(TRADE_HEADER_ROW):
+            next(rows, None)
+        header = next(rows, ())
+        names = clean_columns(pd.DataFrame(columns=["" if h is None else h for h in header])).columns
+        positions = [i for i, name in enumerate(names) if trade_dtype(name) is not None]
+        columns = [names[i] for i in positions]
+
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= chunk_rows:
+                yield _clean_trade_chunk(buffer, positions, columns)
+                buffer = []
+        if buffer:
+            yield _clean_trade_chunk(buffer, positions, columns)
+    finally:
+        book.close()
+
+
+def run_trade_stage(name, stage, write_store=True, chunk_rows=TRADE_CHUNK_ROWS):
+    """Streams a trade sheet chunk by chunk into its CSV and, when enabled, its store table."""
+    chunks = iter_trade_chunks(stage["workbook"], stage["sheet"], chunk_rows)
+    first = next(chunks, None)
+    if first is None:
+        raise ValueError(f"sheet {stage['sheet']!r} has no data rows")
+
+    rows = 0
+    with ExitStack() as stack:
+        csv_path = stack.enter_context(atomic_path(stage["output"]))
+        writer = stack.enter_context(StoreTableWriter(name, first.columns)) if write_store else None
+        for chunk in itertools.chain([first], chunks):
+            chunk.to_csv(csv_path, mode="a", header=rows == 0, index=False)
+            if writer is not None:
+                writer.write(chunk)
+            rows += len(chunk)
+    return rows
+
+
+def clean_sut_sheet(workbook, sheet_name="6.3"):
+    """Reads the SUT/IO sheet, merging the two header rows (3 and 4) into one.
+
+    Where both rows have text the names are joined with " - "; otherwise whichever is
+    present is used, and a column with neither becomes ``Column_<n>``.
+    """
+    df_raw = pd.read_excel(workbook, sheet_name=sheet_name, header=None, dtype=str)
+
+    header_row_1 = df_raw.iloc[2].fillna("")
+    header_row_2 = df_raw.iloc[3].fillna("")
+
+    combined_headers = []
+    for col_idx in range(len(header_row_1)):
+        h1 = str(header_row_1.iloc[col_idx]).strip()
+        h2 = str(header_row_2.iloc[col_idx]).strip()
+        h1 = "" if h1 == "nan" else h1
+        h2 = "" if h2 == "nan" else h2
+        if h1 and h2:
+            combined = f"{h1} - {h2}"
+        else:
+            combined = h1 or h2 or f"Column_{col_idx}"
+        combined_headers.append(combined)
+
+    df_clean = df_raw.iloc[4:].copy()
+    df_clean.columns = combined_headers
+    df_clean.reset_index(drop=True, inplace=True)
+    df_clean = df_clean.dropna(how="all")
+    df_clean = df_clean.dropna(axis=1, how="all")
+    return df_clean.replace("nan", np.nan)
+
+
+def run_sut_stage(name, stage, write_store=True):
+    """Cleans the SUT/IO sheet (small enough to load whole) into its CSV and store table."""
+    df = clean_sut_sheet(stage["workbook"], stage["sheet"])
+    write_csv_atomic(df, stage["output"])
+    if write_store:
+        write_store_table(name, apply_sut_schema(df))
+    return len(df)
+
+
+STAGES = {
+    "imports": dict(workbook=TRADE_WORKBOOK, sheet="Imports", output=IMPORTS_CSV,
+                    run=run_trade_stage, version=TRADE_STAGE_VERSION),
+    "exports": dict(workbook=TRADE_WORKBOOK, sheet="Exports", output=EXPORTS_CSV,
+                    run=run_trade_stage, version=TRADE_STAGE_VERSION),
+    "sut_io": dict(workbook=SUT_WORKBOOK, sheet="6.3", output=SUT_IO_CSV,
+                   run=run_sut_stage, version=SUT_STAGE_VERSION),
+}
+
+
+def stage_key(stage):
+    """Returns the fingerprint that decides whether a stage must rerun."""
+    digest = hashlib.sha256()
+    digest.update(sheet_hash(stage["workbook"], stage["sheet"]).encode())
+    digest.update(f"{stage['sheet']}:{stage['version']}".encode())
+    return digest.hexdigest()
+
+
+def load_state(path=STATE_FILE):
+    """Returns the recorded stage keys from the last run, or an empty state."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"stages": {}}
+
+
+def write_csv_atomic(df, path):
+    """Writes a CSV under a temporary name and renames it into place."""
+    with atomic_path(path) as tmp_path:
+        df.to_csv(tmp_path, index=False)
+
+
+def run(stage_names=None, force=False, build_columnar_store=True, log=print):
+    """Runs the requested stages (all by default), refreshes the store and writes the data-version stamp.
+
+    Returns the names of the stages that actually ran.
+    """
+    state = load_state()
+    stage_names = list(stage_names or STAGES)
+    write_store = build_columnar_store and feather is not None
+    ran = []
+
+    for name in stage_names:
+        stage = STAGES[name]
+        started = time.perf_counter()
+        key = stage_key(stage)
+        previous = state["stages"].get(name, {})
+        if not force and previous.get("key") == key and os.path.exists(stage["output"]):
+            log(f"[skip] {name}: {stage['sheet']} unchanged")
+            continue
+
+        rows = stage["run"](name, stage, write_store=write_store)
+        state["stages"][name] = {"key": key, "output": stage["output"], "rows": rows}
+        write_json_atomic(state, STATE_FILE)
+        ran.append(name)
+        log(f"[done] {name}: {rows} rows -> {stage['output']} ({time.perf_counter() - started:.1f}s)")
+
+    if write_store:
+        # Tables whose stage was skipped but whose CSV changed (or whose file is missing) are rebuilt from CSV.
+        stale = stale_store_tables()
+        stale = [table for table in stale if table not in ran]
+        if stale:
+            build_store(stale)
+            log(f"[done] store tables rebuilt from CSV: {', '.join(stale)}")
+        write_store_manifest()
+
+    stage_keys = "".join(state["stages"].get(name, {}).get("key", "") for name in sorted(STAGES))
+    stamp = {
+        "version": hashlib.sha256(stage_keys.encode()).hexdigest()[:12],
+        "source_fingerprint": source_fingerprint(),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    write_json_atomic(stamp, DATA_VERSION_FILE)
+    log(f"data version {stamp['version']}")
+    return ran
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stage", action="append", choices=sorted(STAGES), help="run only this stage (repeatable)")
+    parser.add_argument("--force", action="store_true", help="rerun stages even if their inputs are unchanged")
+    parser.add_argument("--no-store", action="store_true", help="skip rebuilding the columnar store")
+    args = parser.parse_args(argv)
+    run(args.stage, force=args.force, build_columnar_store=not args.no_store)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
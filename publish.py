@@ -0,0 +1,220 @@
+"""Pre-renders every dashboard sector's figures to a static bundle of Plotly JSON and HTML pages.
+
+Usage:
+    python publish.py                          # render into published/ with one worker per CPU
+    python publish.py --out site --workers 4
+    python publish.py --prune                  # also delete files no longer referenced
+
+Figures, pages and the Plotly library are written under content-addressed names, so an
+unchanged file keeps its name across runs and a static server can cache it forever.
+manifest.json maps each figure's dashboard cache key to its file, which lets the live
+app serve prebuilt figures, and index.html links every sector page. The manifest records
+the data and code versions the bundle was rendered from; the app ignores a bundle from
+other data or chart code until it is published again.
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+from charts import (
+    create_expanded_flow_sankey,
+    flow_bar_chart,
+    flow_heatmap,
+    heatmap_page_count,
+    hs_flow_sankey,
+    sector_overview,
+)
+from datastore import atomic_path, write_json_atomic
+from engine import FLOW_TYPES, DashboardEngine, split_top
+from figure_cache import figure_key
+from warm_cache import code_version
+
+PUBLISH_DIR = os.environ.get("PUBLISHED_DIR", "published")
+MANIFEST = "manifest.json"
+BUNDLE_DIRS = ("figures", "pages", "assets")
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+{scripts}<style>
+body {{ background: #0a0e27; color: #f1f5f9; font-family: Inter, -apple-system, sans-serif; margin: 2rem; }}
+a {{ color: #60a5fa; }}
+h1, h2 {{ font-weight: 600; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+_engine = None
+
+
+def _init_worker():
+    global _engine
+    _engine = DashboardEngine.load()
+
+
+def write_content(out_dir, subdir, payload, suffix):
+    """Writes payload under a name derived from its SHA-256 and returns the path relative to out_dir."""
+    data = payload.encode("utf-8")
+    name = f"{subdir}/{hashlib.sha256(data).hexdigest()[:20]}{suffix}"
+    path = os.path.join(out_dir, name)
+    if not os.path.exists(path):
+        with atomic_path(path) as tmp_path:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+    return name
+
+
+def sector_figures(engine, sector, year):
+    """Yields (cache key, title, figure) for every figure on a sector's dashboard pages for one year.
+
+    Figures are built exactly as the dashboard builds them in its default state: B2B sales
+    not expanded and every heatmap page.
+    """
+    version = engine.version
+    summary = engine.sector_summary(sector, year)
+    yield figure_key(version, sector, "overview", None, year, None), "Overview", sector_overview(sector, summary)
+    for flow_type in FLOW_TYPES:
+        df_flow = engine.sector_index(flow_type, year).get(sector)
+        if df_flow.empty:
+            continue
+        yield (figure_key(version, sector, "bar", flow_type, year), f"Top {flow_type}",
+               flow_bar_chart(sector, df_flow, flow_type, year))
+        yield (figure_key(version, sector, "expanded", flow_type, year), f"{flow_type} breakdown",
+               create_expanded_flow_sankey(sector, df_flow, flow_type, year))
+        yield (figure_key(version, sector, "hs", flow_type, year, None), f"{flow_type} by HS chapter",
+               hs_flow_sankey(sector, engine.hs_breakdown(sector, flow_type, year), flow_type, year))
+        for page in range(heatmap_page_count(len(split_top(df_flow)[1]))):
+            yield (figure_key(version, sector, "heatmap", flow_type, year, page), f"Remaining {flow_type.lower()}",
+                   flow_heatmap(df_flow, flow_type, year, page))
+
+
+def render_sector(out_dir, sector, year, plotly_js):
+    """Renders one sector and year in a worker: writes its figure files and HTML page, returns their manifest entries."""
+    engine = _engine
+    figures, sections = [], []
+    for key, title, fig in sector_figures(engine, sector, year):
+        if fig is None:
+            figures.append({"key": list(key), "file": None})
+            continue
+        figures.append({"key": list(key), "file": write_content(out_dir, "figures", pio.to_json(fig, validate=False), ".json")})
+        div = pio.to_html(fig, full_html=False, include_plotlyjs=False, config={"displayModeBar": False})
+        sections.append(f"<h2>{html.escape(title)}</h2>\n{div}")
+
+    body = f'<p><a href="../index.html">All sectors</a></p>\n<h1>{html.escape(sector)} — {year}</h1>\n' + "\n".join(sections)
+    scripts = f'<script src="../{plotly_js}"></script>\n'
+    page = PAGE_TEMPLATE.format(title=html.escape(f"{sector} — {year}"), scripts=scripts, body=body)
+    return {
+        "version": engine.version,
+        "sector": sector,
+        "year": year,
+        "page": write_content(out_dir, "pages", page, ".html"),
+        "figures": figures,
+    }
+
+
+def write_index(out_dir, engine, pages):
+    """Writes index.html linking every sector page, one list per year in dashboard order."""
+    by_key = {(page["sector"], page["year"]): page["page"] for page in pages}
+    sections = []
+    for year in engine.years:
+        items = "\n".join(
+            f'<li><a href="{by_key[(sector, year)]}">{html.escape(sector)}</a></li>'
+            for sector in engine.dashboard_sectors().index
+        )
+        sections.append(f"<h2>{year}</h2>\n<ul>\n{items}\n</ul>")
+    body = "<h1>Industrial sector economic data</h1>\n" + "\n".join(sections)
+    index = PAGE_TEMPLATE.format(title="Industrial sector economic data", scripts="", body=body)
+    with atomic_path(os.path.join(out_dir, "index.html")) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(index)
+
+
+def prune(out_dir, referenced):
+    """Deletes bundle files not referenced by the current manifest; returns how many were removed."""
+    removed = 0
+    for subdir in BUNDLE_DIRS:
+        for name in os.listdir(os.path.join(out_dir, subdir)):
+            if f"{subdir}/{name}" not in referenced:
+                os.remove(os.path.join(out_dir, subdir, name))
+                removed += 1
+    return removed
+
+
+def publish(out_dir=PUBLISH_DIR, workers=None, remove_stale=False, log=print):
+    """Renders every dashboard sector for every trade year into out_dir and writes the manifest."""
+    started = time.perf_counter()
+    engine = DashboardEngine.load()
+    for subdir in BUNDLE_DIRS:
+        os.makedirs(os.path.join(out_dir, subdir), exist_ok=True)
+    plotly_js = write_content(out_dir, "assets", get_plotlyjs(), ".js")
+
+    tasks = [(sector, year) for year in engine.years for sector in engine.dashboard_sectors().index]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(render_sector, out_dir, sector, year, plotly_js) for sector, year in tasks]
+        pages = [future.result() for future in futures]
+
+    versions = {page["version"] for page in pages}
+    if versions != {engine.version}:
+        raise RuntimeError(f"data changed while publishing (versions {sorted(versions)}); rerun publish")
+
+    write_index(out_dir, engine, pages)
+    figures = [figure for page in pages for figure in page["figures"]]
+    manifest = {
+        "version": engine.version,
+        "code_version": code_version(),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "plotly_js": plotly_js,
+        "pages": [{key: page[key] for key in ("sector", "year", "page")} for page in pages],
+        "figures": figures,
+    }
+    write_json_atomic(manifest, os.path.join(out_dir, MANIFEST))
+
+    if remove_stale:
+        referenced = {plotly_js} | {page["page"] for page in pages} | {f["file"] for f in figures if f["file"]}
+        log(f"[prune] removed {prune(out_dir, referenced)} stale files")
+    log(f"[done] {len(pages)} pages, {len(figures)} figures -> {out_dir} "
+        f"(data version {engine.version}, {time.perf_counter() - started:.1f}s)")
+    return manifest
+
+
+def published_figures(out_dir=PUBLISH_DIR, version=None):
+    """Returns {cache key: figure file path or None} from a bundle built for version by the current code, or {}."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != version or manifest.get("code_version") != code_version():
+        return {}
+    return {
+        tuple(figure["key"]): os.path.join(out_dir, figure["file"]) if figure["file"] else None
+        for figure in manifest["figures"]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default=PUBLISH_DIR, help="bundle directory (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--prune", action="store_true", help="delete files the new manifest no longer references")
+    args = parser.parse_args(argv)
+    publish(args.out, args.workers, args.prune)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
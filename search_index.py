@@ -0,0 +1,89 @@
+import re
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from hs_rollup import CODE_COLUMN, hs_code_strings
+from labels import COMMODITY_NAME
+from time_series import year_columns
+
+TOKEN = re.compile(r"\w+")
+NAME_COLUMNS = list(COMMODITY_NAME.values())
+
+
+def tokenize(text):
+    """Splits text into lowercase word tokens; Arabic and Latin words alike."""
+    return TOKEN.findall(str(text).lower())
+
+
+class CommoditySearchIndex:
+    """Inverted index over commodity names (English and Arabic) and HS codes of both trade flows.
+
+    Each word of a query matches index tokens it is a prefix of; a hit must match every
+    word. A purely numeric word also matches HS codes by prefix. Hits rank by how many
+    words matched a whole token, then by the latest year's value.
+    """
+
+    def __init__(self, docs):
+        self.docs = docs.reset_index(drop=True)
+        self.years = year_columns(self.docs)
+        self.codes = hs_code_strings(self.docs[CODE_COLUMN])
+        self._code_order = np.argsort(self.codes, kind="stable")
+        self._sorted_codes = self.codes[self._code_order].tolist()
+
+        pairs = pd.concat([
+            self.docs[column].astype(str).str.lower().str.findall(TOKEN).explode().dropna().rename("token").reset_index()
+            for column in NAME_COLUMNS
+        ])
+        pairs = pairs.drop_duplicates().sort_values(["token", "index"], kind="stable")
+        tokens = pairs["token"].to_numpy(dtype=object)
+        starts = np.flatnonzero(np.concatenate([[True], tokens[1:] != tokens[:-1]])) if len(tokens) else np.array([], int)
+        self.vocabulary = tokens[starts].tolist()
+        self._offsets = np.append(starts, len(tokens))
+        self._postings = pairs["index"].to_numpy()
+        self._rank_value = np.nan_to_num(self.docs[self.years[-1]].to_numpy(dtype=float)) if self.years else np.zeros(len(self.docs))
+
+    def __len__(self):
+        return len(self.docs)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the indexed rows and the postings."""
+        return int(self.docs.memory_usage(index=True, deep=True).sum()) + self._postings.nbytes + self._offsets.nbytes
+
+    def _token_docs(self, word):
+        """Returns (docs with a token starting with word, docs with a token equal to word)."""
+        lo = bisect_left(self.vocabulary, word)
+        hi = bisect_left(self.vocabulary, word + "\U0010ffff")
+        prefix = np.unique(self._postings[self._offsets[lo]:self._offsets[hi]])
+        exact = np.array([], dtype=self._postings.dtype)
+        if lo < len(self.vocabulary) and self.vocabulary[lo] == word:
+            exact = self._postings[self._offsets[lo]:self._offsets[lo + 1]]
+        return prefix, exact
+
+    def _code_docs(self, digits):
+        lo = bisect_left(self._sorted_codes, digits)
+        hi = bisect_left(self._sorted_codes, digits + ":")
+        return np.sort(self._code_order[lo:hi])
+
+    def search(self, query, limit=20):
+        """Returns up to limit ranked hits as rows of the indexed frame plus ``hs_code`` and ``score`` columns."""
+        words = tokenize(query)
+        if not words:
+            return self.docs.iloc[0:0].assign(hs_code=[], score=[])
+        candidates = None
+        score = np.zeros(len(self.docs))
+        for word in words:
+            prefix, exact = self._token_docs(word)
+            if word.isdigit():
+                codes = self._code_docs(word)
+                prefix = np.union1d(prefix, codes)
+                exact = np.union1d(exact, codes)
+            candidates = prefix if candidates is None else np.intersect1d(candidates, prefix, assume_unique=True)
+            score[exact] += 1
+            if not len(candidates):
+                break
+        order = np.lexsort((-self._rank_value[candidates], -score[candidates]))[:limit]
+        hits = candidates[order]
+        return self.docs.iloc[hits].assign(hs_code=self.codes[hits], score=score[hits])
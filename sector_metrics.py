@@ -0,0 +1,41 @@
+import pandas as pd
+
+from crosswalk import build_crosswalk, sut_codes, trade_codes
+from time_series import year_columns
+
+# SUT/IO values are published in thousands of Saudi riyals.
+SUT_UNIT = 1000
+
+SUT_COLUMNS = {
+    "total_intermediate": "Total Intermediate Consumption",
+    "final_consumption": "Final consumption expenditures",
+    "gross_capital_formation": "Gross capital formation",
+    "total_exports": "Total Export",
+}
+
+def _trade_totals(df, prefix):
+    """Sums each trade year per ISIC code into columns such as imports_2023."""
+    years = year_columns(df)
+    values = df[years].apply(pd.to_numeric, errors="coerce")
+    totals = values.groupby(trade_codes(df).rename("isic_code")).sum()
+    return totals.rename(columns=lambda year: f"{prefix}_{year}")
+
+
+def build_sector_metrics(imports, exports, sut_io, crosswalk=None):
+    """Builds one row per trade sector with SUT/IO demand totals, output and trade totals by year."""
+    if crosswalk is None:
+        crosswalk = build_crosswalk(imports, exports, sut_io)
+
+    sut_values = sut_io[list(SUT_COLUMNS.values())].apply(pd.to_numeric, errors="coerce") * SUT_UNIT
+    sut_values.columns = list(SUT_COLUMNS)
+    sut_values = sut_values.groupby(sut_codes(sut_io).rename("isic_code")).sum()
+
+    sectors = crosswalk.loc[crosswalk["trade_name"].notna(), ["trade_name", "sut_name"]]
+    metrics = sectors.join(sut_values)
+    metrics["total_output"] = metrics[list(SUT_COLUMNS)].sum(axis=1)
+    metrics = metrics.join(_trade_totals(imports, "imports")).join(_trade_totals(exports, "exports"))
+
+    numeric = metrics.columns.difference(["trade_name", "sut_name"])
+    metrics[numeric] = metrics[numeric].fillna(0.0)
+    metrics = metrics.reset_index().rename(columns={"sut_name": "sut_sector"})
+    return metrics.set_index(pd.Index(metrics.pop("trade_name"), name="sector"))
@@ -0,0 +1,83 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+YEAR_PATTERN = re.compile(r"^\d{4}$")
+
+ID_COLUMNS = ["CC_CODE", "CC_DESC_AR", "CC_DESC_EN", "COMMODTIY_CODE", "COMM_NAME_AR", "COMM_NAME_EN"]
+# Sector and commodity names in both languages, kept dictionary-encoded (categorical) throughout.
+LABEL_COLUMNS = ["CC_DESC_AR", "CC_DESC_EN", "COMM_NAME_AR", "COMM_NAME_EN"]
+FLOWS = ("Imports", "Exports")
+
+
+def year_columns(df):
+    """Returns the four-digit year columns of a trade table in ascending order."""
+    return sorted(str(column) for column in df.columns if YEAR_PATTERN.match(str(column)))
+
+
+def _flow_long(df, flow):
+    """Melts one trade table to long format with growth, shares and ranks computed across all years at once."""
+    years = year_columns(df)
+    values = df[years].to_numpy(dtype=float)
+    n_rows, n_years = values.shape
+    # As in the source's Growth and Share columns, a commodity missing in a year counts as zero trade.
+    filled = np.nan_to_num(values)
+
+    previous = np.column_stack([np.full(n_rows, np.nan), values[:, :-1]])
+    growth = np.full_like(values, np.nan)
+    np.divide(filled - previous, previous, out=growth, where=(previous != 0) & ~np.isnan(previous))
+
+    share = filled / filled.sum(axis=0)
+
+    by_sector = pd.DataFrame(filled, columns=years).groupby(df["CC_CODE"].to_numpy())
+    sector_totals = by_sector.transform("sum").to_numpy()
+    sector_share = np.full_like(values, np.nan)
+    np.divide(filled, sector_totals, out=sector_share, where=sector_totals != 0)
+    rank = by_sector.rank(ascending=False, method="first").to_numpy()
+
+    rows = np.tile(np.arange(n_rows), n_years)
+    long = df[ID_COLUMNS].iloc[rows].reset_index(drop=True)
+    long.insert(0, "flow", pd.Categorical([flow] * len(long), categories=FLOWS))
+    long["year"] = np.repeat(np.array(years, dtype=int), n_rows).astype("int16")
+    long["value"] = values.ravel(order="F")
+    long["growth"] = growth.ravel(order="F")
+    long["share"] = share.ravel(order="F")
+    long["sector_share"] = sector_share.ravel(order="F")
+    long["rank"] = pd.array(rank.ravel(order="F"), dtype="Int32")
+    return long
+
+
+def build_trade_long(imports, exports):
+    """Builds the long (flow, sector, commodity, year) trade table with YoY growth, shares and in-sector ranks.
+
+    Name columns share one set of categories across both flows, so they concatenate as
+    integer codes into a single lookup array per column instead of repeated strings.
+    """
+    longs = [_flow_long(imports, "Imports"), _flow_long(exports, "Exports")]
+    for column in LABEL_COLUMNS:
+        names = [long[column].astype("category") for long in longs]
+        categories = names[0].cat.categories.union(names[1].cat.categories)
+        for long, values in zip(longs, names):
+            long[column] = values.cat.set_categories(categories)
+    return pd.concat(longs, ignore_index=True)
+
+
+def available_years(long):
+    """Returns the years present in the long table as strings, oldest first."""
+    return [str(year) for year in sorted(long["year"].unique())]
+
+
+def year_view(long, flow, year):
+    """Returns one flow's rows with a value column per year and the growth, shares and rank of ``year``."""
+    flow_rows = long[long["flow"] == flow]
+    rows = flow_rows[flow_rows["year"] == int(year)]
+    view = rows[ID_COLUMNS].copy()
+    # Every year holds the same commodities in the same order, so the value blocks line up.
+    for other in available_years(flow_rows):
+        view[other] = flow_rows.loc[flow_rows["year"] == int(other), "value"].to_numpy()
+    view["Growth"] = rows["growth"].to_numpy()
+    view["Share"] = rows["share"].to_numpy()
+    view["Sector Share"] = rows["sector_share"].to_numpy()
+    view["Rank"] = rows["rank"].to_numpy()
+    return view.reset_index(drop=True)
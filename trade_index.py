@@ -0,0 +1,47 @@
+import numpy as np
+
+SECTOR_COLUMN = "CC_DESC_EN"
+
+
+class SectorIndex:
+    """Trade rows grouped into one contiguous block per sector, each sorted by a year's value descending.
+
+    The frame is sorted once on construction (``presorted=True`` skips that for a frame
+    taken from another index); ``get`` returns a positional slice of it, which pandas
+    hands back as a view rather than a copy.
+    """
+
+    def __init__(self, df, year="2023", presorted=False):
+        self.year = year
+        self.frame = df if presorted else df.sort_values(
+            [SECTOR_COLUMN, year], ascending=[True, False], na_position="last", kind="stable"
+        )
+        keys = self.frame[SECTOR_COLUMN].to_numpy(dtype=object)
+        if len(keys):
+            starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+            stops = np.append(starts[1:], len(keys))
+            self._slices = {keys[start]: slice(start, stop) for start, stop in zip(starts, stops)}
+        else:
+            self._slices = {}
+        self._empty = self.frame.iloc[0:0]
+
+    def __contains__(self, sector):
+        return sector in self._slices
+
+    def __len__(self):
+        return len(self._slices)
+
+    @property
+    def sectors(self):
+        return list(self._slices)
+
+    def get(self, sector):
+        """Returns the sector's rows sorted by value descending, or an empty frame for an unknown sector."""
+        rows = self._slices.get(sector)
+        if rows is None:
+            return self._empty
+        return self.frame.iloc[rows]
+
+    def sizes(self):
+        """Returns the number of rows held for each sector."""
+        return {sector: rows.stop - rows.start for sector, rows in self._slices.items()}
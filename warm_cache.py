@@ -0,0 +1,186 @@
+"""Disk-backed warm-start cache of the dashboard engine's frames and rendered figures.
+
+Usage:
+    python warm_cache.py                    # pre-warm for the current data and code
+    python warm_cache.py --no-figures       # engine frames only
+    python warm_cache.py --prune            # also delete caches of other data or code versions
+
+Each (data version, code version) pair gets its own directory under WARM_CACHE_DIR
+(default cache/warm): every frame the engine holds as an Arrow file, plus one JSON file
+per figure, at most WARM_CACHE_MAX_FIGURES (default 2000). A restarted worker restores
+its engine from there without reading the CSVs or recomputing metrics and indexes:
+the files are memory-mapped, so numeric columns and categorical codes stay views of
+the page cache that every worker on the machine shares. Cached figures are served
+without rebuilding them. The code version hashes the Python sources next to
+this file, so a deploy that changes how anything is computed starts a fresh cache.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+from datastore import arrow_table, atomic_path, feather, read_frame, write_arrow, write_json_atomic
+from engine import FLOW_TYPES, DashboardEngine
+from figure_cache import serialize_figure
+
+CACHE_DIR = os.environ.get("WARM_CACHE_DIR", os.path.join("cache", "warm"))
+# Figures kept per cache directory; once full, further figures are not written.
+MAX_FIGURES = int(os.environ.get("WARM_CACHE_MAX_FIGURES", "2000"))
+MANIFEST = "manifest.json"
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def code_version(source_dir=SOURCE_DIR):
+    """Returns a short hash of the dashboard's Python sources."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(source_dir)):
+        if name.endswith(".py"):
+            with open(os.path.join(source_dir, name), "rb") as f:
+                digest.update(name.encode("utf-8") + b"\0" + f.read())
+    return digest.hexdigest()[:12]
+
+
+class WarmCache:
+    """The cached engine frames and figures of one data version, valid for the current code only.
+
+    Writes are best effort: a read-only or full disk costs the next restart its warm
+    start, never the current request.
+    """
+
+    def __init__(self, version, cache_dir=CACHE_DIR, max_figures=MAX_FIGURES):
+        self.version = version
+        self.cache_dir = cache_dir
+        self.max_figures = max_figures
+        self.code_version = code_version()
+        self.path = os.path.join(cache_dir, f"{version}-{self.code_version}")
+        self._figure_count = None
+        self._lock = threading.Lock()
+
+    def _figure_path(self, key):
+        name = hashlib.sha256(json.dumps(list(key)).encode("utf-8")).hexdigest()[:24]
+        return os.path.join(self.path, "figures", f"{name}.json")
+
+    def load_engine(self, **options):
+        """Returns the engine restored from this cache, or None when none was saved for this version."""
+        if feather is None:
+            return None
+        try:
+            with open(os.path.join(self.path, MANIFEST), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        frames = {name: read_frame(os.path.join(self.path, file)) for name, file in manifest["frames"].items()}
+        return DashboardEngine.from_state(frames, version=self.version, **options)
+
+    def save_engine(self, engine):
+        """Writes every frame the engine holds, then the manifest, so a partly written cache is never loaded."""
+        if feather is None:
+            return None
+        files = {}
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            for name, frame in engine.state().items():
+                files[name] = name.replace(":", "-") + ".arrow"
+                write_arrow(arrow_table(frame), os.path.join(self.path, files[name]))
+            manifest = {
+                "version": self.version,
+                "code_version": self.code_version,
+                "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "frames": files,
+            }
+            write_json_atomic(manifest, os.path.join(self.path, MANIFEST))
+        except OSError:
+            return None
+        return manifest
+
+    def get_figure(self, key):
+        """Returns a cached figure's JSON, or None."""
+        try:
+            with open(self._figure_path(key), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _reserve_figure(self):
+        """Counts one more figure file unless the cache is full; returns whether there was room."""
+        with self._lock:
+            if self._figure_count is None:
+                try:
+                    self._figure_count = len(os.listdir(os.path.join(self.path, "figures")))
+                except OSError:
+                    self._figure_count = 0
+            if self._figure_count >= self.max_figures:
+                return False
+            self._figure_count += 1
+            return True
+
+    def put_figure(self, key, payload):
+        """Writes a figure's JSON unless the cache already holds max_figures; returns whether it was written."""
+        path = self._figure_path(key)
+        if os.path.exists(path) or not self._reserve_figure():
+            return False
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with atomic_path(path) as tmp_path:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(payload)
+        except OSError:
+            return False
+        return True
+
+    def prune(self):
+        """Deletes the caches of every other data or code version; returns how many were removed."""
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if os.path.isdir(path) and os.path.abspath(path) != os.path.abspath(self.path):
+                shutil.rmtree(path)
+                removed += 1
+        return removed
+
+
+def prewarm(cache_dir=CACHE_DIR, figures=True, remove_stale=False, log=print):
+    """Builds the engine with every sector index and the HS rollup, saves it, and renders every sector's figures."""
+    from publish import sector_figures
+
+    started = time.perf_counter()
+    engine = DashboardEngine.load()
+    cache = WarmCache(engine.version, cache_dir)
+    for flow_type in FLOW_TYPES:
+        for year in engine.years:
+            engine.sector_index(flow_type, year)
+    engine.hs_rollup
+    if cache.save_engine(engine) is None:
+        raise RuntimeError(f"could not write the warm cache to {cache.path} (is pyarrow installed?)")
+    log(f"[engine] {len(engine.state())} frames -> {cache.path}")
+
+    count = 0
+    if figures:
+        for year in engine.years:
+            for sector in engine.dashboard_sectors().index:
+                for key, _, fig in sector_figures(engine, sector, year):
+                    count += cache.put_figure(key, serialize_figure(fig))
+        log(f"[figures] {count} figures written (at most {cache.max_figures} are kept)")
+    if remove_stale:
+        log(f"[prune] removed {cache.prune()} stale caches")
+    log(f"[done] data version {engine.version}, code version {cache.code_version} "
+        f"({time.perf_counter() - started:.1f}s)")
+    return cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="cache directory (default: %(default)s)")
+    parser.add_argument("--no-figures", action="store_true", help="cache the engine frames only")
+    parser.add_argument("--prune", action="store_true", help="delete caches of other data or code versions")
+    args = parser.parse_args(argv)
+    prewarm(args.cache_dir, figures=not args.no_figures, remove_stale=args.prune)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())